@@ -2,32 +2,48 @@ from concurrent.futures import ThreadPoolExecutor
 import csv
 import json
 import random
-from typing import List, Any
-from src.text_relevance.scheme2 import text_relevance, model
-from sentence_transformers import SentenceTransformer, util
+from typing import List, Any, Tuple
+from src.text_relevance.scheme2 import RELEVANCE_THRESHOLD, ACCURACY
+from src.text_relevance import scheme2
+from src.text_relevance import scheme1
+from src.text_relevance import calibration
+from src.text_relevance.router import is_pure_chinese
 import time
 import pandas as pd
 import math
+import numpy as np
 
 ALL_DATA_FILE_PATH = "../data/all_data.jsonl"
 INFORMATION_FILE_PATH = "../data/professor_information.jsonl"
 
-from config.constants import MAX_WORKERS
+from config.constants import MAX_WORKERS, MAX_SEQ_LENGTH, CALIBRATION_PATH
 
 CSV_PATH = "data/paper_scores.csv"
 
+# 带标签的文本对，供 cal_cascade_thresholds() 等使用。每行为 {"subject", "article_info", "label", "score"}
+PAIRS_PATH = "data/labelled_pairs.jsonl"
+
 
 class SolveCounter():
     finished = 0
 
     @classmethod
     def cal_score(cls, text_pair: List[str]) -> float:
-        score = text_relevance(text_pair[0], text_pair[1])
+        score = scheme2.text_relevance(text_pair[0], text_pair[1])
         cls.finished += 1
         if cls.finished % 10 == 0:
             print(f"已完成 {cls.finished} / {sample_size}")
         return score
 
+def _row_cos_sim(embeddings1: np.ndarray, embeddings2: np.ndarray) -> List[float]:
+    """
+    计算两组向量逐行的余弦相似度。
+    """
+    embeddings1 = embeddings1 / np.maximum(np.linalg.norm(embeddings1, axis = 1, keepdims = True), 1e-12)
+    embeddings2 = embeddings2 / np.maximum(np.linalg.norm(embeddings2, axis = 1, keepdims = True), 1e-12)
+    return (embeddings1 * embeddings2).sum(axis = 1).tolist()
+
+
 def batch_relevance_fast(text_pairs):
     """
     批量编码优化：一次性编码所有文本，再计算相似度
@@ -38,12 +54,12 @@ def batch_relevance_fast(text_pairs):
     all_text1 = [pair[0] for pair in text_pairs]
     all_text2 = [pair[1] for pair in text_pairs]
 
-    # 批量编码（一次调用处理所有文本，利用矩阵并行）
-    embeddings1 = model.encode(all_text1, convert_to_tensor=True)  # 形状：(N, 384)
-    embeddings2 = model.encode(all_text2, convert_to_tensor=True)  # 形状：(N, 384)
+    # 批量编码（经过向量缓存，并按长度分桶，减少填充）
+    embeddings1 = scheme2.encode(all_text1)  # 形状：(N, 768)
+    embeddings2 = scheme2.encode(all_text2)  # 形状：(N, 768)
 
-    # 批量计算余弦相似度（逐对计算，利用PyTorch广播机制）
-    similarities = util.cos_sim(embeddings1, embeddings2).diag().tolist()  # 取对角线（每个text1与对应text2的相似度）
+    # 逐对计算余弦相似度
+    similarities = _row_cos_sim(embeddings1, embeddings2)
     results = [round(sim, 4) for sim in similarities]
 
     return results
@@ -148,6 +164,7 @@ def cal_scores():
     
     total_time = time.time() - start_time
     print(f"总耗时：{total_time:.2f}秒")
+    print(f"编码的填充效率：{scheme2.stats()['efficiency']:.2%}")
 
     with open(CSV_PATH, mode = "w", encoding = "utf-8", newline = "") as file:
         writer = csv.writer(file)
@@ -156,14 +173,97 @@ def cal_scores():
         for score in neg_scores:
             writer.writerow((score, 0))
 
+    with open(PAIRS_PATH, mode = "w", encoding = "utf-8") as file:
+        for (text_pairs, scores, label) in ((pos_text_pairs, pos_scores, 1), (neg_text_pairs, neg_scores, 0)):
+            for ((subject, article_info), score) in zip(text_pairs, scores):
+                json.dump({"subject": subject, "article_info": article_info, "label": label, "score": score}, file, ensure_ascii = False)
+                file.write("\n")
 
-def cal_best_score():
-    # 加载数据集
-    df = pd.read_csv(CSV_PATH)
 
-    # 重命名列名
-    df.columns = ['score', 'class_label']
+def load_labelled_pairs() -> List[dict]:
+    """
+    读取 cal_scores() 保存的带标签的文本对。
+    """
+    pairs = []
+    with open(PAIRS_PATH, mode = "r", encoding = "utf-8") as file:
+        for line in (line.strip() for line in file):
+            if line:
+                pairs.append(json.loads(line))
+    return pairs
+
+
+def batch_scores(scheme, pairs: List[dict]) -> List[float]:
+    """
+    用 `scheme.text_relevance_batch()` 计算各文本对的得分，与爬取时的打分方式相同：
+    subject 相同的文本对在一次调用中打分。
+
+    Return: 与 pairs 一一对应的得分。
+    """
+    groups = {}
+    for (idx, pair) in enumerate(pairs):
+        groups.setdefault(pair["subject"], []).append(idx)
+    scores = [0.0] * len(pairs)
+    for (subject, indices) in groups.items():
+        for (idx, score) in zip(indices, scheme.text_relevance_batch(subject, [pairs[idx]["article_info"] for idx in indices])):
+            scores[idx] = score
+    return scores
+
+
+def cal_cascade_thresholds(max_error_rate: float = 0.01):
+    """
+    为级联方案（src.text_relevance.cascade）标定 scheme1 得分的两个切分点。
+
+    - LOWER_THRESHOLD：低于它的正样本不超过 max_error_rate ，即直接拒绝时误拒的比例。
+    - UPPER_THRESHOLD：不低于它的负样本不超过 max_error_rate ，即直接接受时误收的比例。
 
+    结果连同交给 scheme2 的比例、模拟的准确率一起保存到 CALIBRATION_PATH ，级联方案在导入时读取。
+    两个方案的得分都经由爬取时所用的 text_relevance_batch() 计算，见 batch_scores() 。
+    """
+    pairs = load_labelled_pairs()
+    cheap_scores = batch_scores(scheme1, pairs)
+    pos_scores = sorted(score for (score, pair) in zip(cheap_scores, pairs) if pair["label"] == 1)
+    neg_scores = sorted(score for (score, pair) in zip(cheap_scores, pairs) if pair["label"] == 0)
+
+    lower = pos_scores[int(len(pos_scores) * max_error_rate)]
+    upper = neg_scores[min(len(neg_scores) - 1, math.ceil(len(neg_scores) * (1 - max_error_rate)))]
+    upper = max(upper, lower)
+
+    # 用 scheme2 的得分模拟级联方案，估计准确率和交给 scheme2 的比例
+    ambiguous = [pair for (cheap_score, pair) in zip(cheap_scores, pairs) if lower <= cheap_score < upper]
+    costly_scores = {id(pair): score for (pair, score) in zip(ambiguous, batch_scores(scheme2, ambiguous))}
+    correct = 0
+    escalated = 0
+    for (cheap_score, pair) in zip(cheap_scores, pairs):
+        if cheap_score < lower:
+            predicted = 0
+        elif cheap_score >= upper:
+            predicted = 1
+        else:
+            escalated += 1
+            predicted = int(costly_scores[id(pair)] >= RELEVANCE_THRESHOLD)
+        correct += int(predicted == pair["label"])
+
+    values = {
+        "LOWER_THRESHOLD": lower,
+        "UPPER_THRESHOLD": upper,
+        "escalated_ratio": escalated / len(pairs),
+        "accuracy": correct / len(pairs),
+        "pairs": len(pairs),
+    }
+    calibration.save("cascade", values, scheme1 = scheme1.model_id())
+    print(f'LOWER_THRESHOLD 为: {lower}')
+    print(f'UPPER_THRESHOLD 为: {upper}')
+    print(f'交给 scheme2 的比例为: {values["escalated_ratio"]}')
+    print(f'级联方案的分类准确率为: {values["accuracy"]}')
+    print(f'已保存到 {CALIBRATION_PATH}')
+
+
+def best_threshold(df: pd.DataFrame) -> Tuple[float, float]:
+    """
+    在列为 ['score', 'class_label'] 的数据集上，找出使分类准确率最高的阈值。
+
+    Return: (最优阈值, 对应的分类准确率)
+    """
     # 获取 score 的最小值和最大值
     min_score = df['score'].min()
     max_score = df['score'].max()
@@ -185,10 +285,122 @@ def cal_best_score():
             best_accuracy = accuracy
             best_threshold = threshold
 
-    print(f'最优的 score 阈值为: {best_threshold}')
-    print(f'对应的分类准确率为: {best_accuracy}')
+    return (best_threshold, best_accuracy)
+
+
+def cal_best_score():
+    # 加载数据集
+    df = pd.read_csv(CSV_PATH)
+
+    # 重命名列名
+    df.columns = ['score', 'class_label']
+
+    (threshold, accuracy) = best_threshold(df)
+
+    print(f'最优的 score 阈值为: {threshold}')
+    print(f'对应的分类准确率为: {accuracy}')
+
+
+def cal_scheme1_tfidf():
+    """
+    在带标签的文本对（PAIRS_PATH 中的 subject 与 article_info）上拟合 scheme1 的 TF-IDF 模型，
+    在同一模型下重新标定 scheme1 的阈值，并把两者一起保存到 TFIDF_MODEL_PATH 。
+
+    删除 TFIDF_MODEL_PATH 即恢复逐对拟合，阈值也恢复为 scheme1.RELEVANCE_THRESHOLD 的默认值。
+    """
+    pairs = load_labelled_pairs()
+    subjects = [pair["subject"] for pair in pairs]
+    articles = [pair["article_info"] for pair in pairs]
+    vectorizer = scheme1.fit_vectorizer([*dict.fromkeys(subjects), *articles])
+
+    # 逐对的余弦相似度（向量已做 L2 归一化）
+    scores = np.asarray(vectorizer.transform(subjects).multiply(vectorizer.transform(articles)).sum(axis = 1)).ravel()
+    df = pd.DataFrame({"score": scores, "class_label": [pair["label"] for pair in pairs]})
+    (threshold, accuracy) = best_threshold(df)
+
+    scheme1.save_model(vectorizer, float(threshold), float(accuracy), f"{PAIRS_PATH} 中的 subject 与 article_info（{len(pairs)} 对）")
+    print(f'scheme1 的 RELEVANCE_THRESHOLD 为: {threshold}，对应的分类准确率为: {accuracy}')
+
+
+def cal_route_thresholds():
+    """
+    为路由方案（src.text_relevance.router）分别标定两条路由的阈值。
+
+    - CHINESE_THRESHOLD：在纯中文的文本对上，scheme1 的最优阈值。没有纯中文的文本对时为 None ，即不启用这条路由。
+    - MIXED_THRESHOLD  ：在其余文本对上，scheme2 的最优阈值。
+
+    结果连同各路由的准确率、纯中文的比例一起保存到 CALIBRATION_PATH ，路由方案在导入时读取。
+    两条路由的得分都经由爬取时所用的 text_relevance_batch() 计算，见 batch_scores() 。
+    """
+    pairs = load_labelled_pairs()
+    chinese_pairs = [pair for pair in pairs if is_pure_chinese(pair["subject"]) and is_pure_chinese(pair["article_info"])]
+    mixed_pairs = [pair for pair in pairs if not (is_pure_chinese(pair["subject"]) and is_pure_chinese(pair["article_info"]))]
+    values = {"chinese_ratio": len(chinese_pairs) / len(pairs), "pairs": len(pairs)}
+    print(f"纯中文的文本对占 {values['chinese_ratio']:.2%}")
+
+    (values["CHINESE_THRESHOLD"], values["chinese_accuracy"]) = (None, None)
+    if chinese_pairs:
+        df = pd.DataFrame({
+            "score": batch_scores(scheme1, chinese_pairs),
+            "class_label": [pair["label"] for pair in chinese_pairs],
+        })
+        (threshold, accuracy) = best_threshold(df)
+        (values["CHINESE_THRESHOLD"], values["chinese_accuracy"]) = (float(threshold), float(accuracy))
+        print(f'CHINESE_THRESHOLD 为: {threshold}，对应的分类准确率为: {accuracy}')
+
+    (values["MIXED_THRESHOLD"], values["mixed_accuracy"]) = (RELEVANCE_THRESHOLD, None)
+    if mixed_pairs:
+        df = pd.DataFrame({
+            "score": batch_scores(scheme2, mixed_pairs),
+            "class_label": [pair["label"] for pair in mixed_pairs],
+        })
+        (threshold, accuracy) = best_threshold(df)
+        (values["MIXED_THRESHOLD"], values["mixed_accuracy"]) = (float(threshold), float(accuracy))
+        print(f'MIXED_THRESHOLD 为: {threshold}，对应的分类准确率为: {accuracy}')
+
+    calibration.save("router", values, scheme1 = scheme1.model_id(), scheme2 = scheme2.model_id())
+    print(f'已保存到 {CALIBRATION_PATH}')
+
+
+def _pair_scores(model, text_pairs: List[Tuple[str, str]]) -> List[float]:
+    """
+    用 `model` 逐对计算文本对的余弦相似度，不经过向量缓存。
+    """
+    embeddings1 = scheme2.encode_with(model, [pair[0] for pair in text_pairs])
+    embeddings2 = scheme2.encode_with(model, [pair[1] for pair in text_pairs])
+    return _row_cos_sim(embeddings1, embeddings2)
+
+
+def cal_quantization_report(max_seq_length: int = MAX_SEQ_LENGTH):
+    """
+    在带标签的文本对上，对比 fp32 模型与 int8 量化模型的得分、准确率和耗时。
+    """
+    pairs = load_labelled_pairs()
+    text_pairs = [(pair["subject"], pair["article_info"]) for pair in pairs]
+    labels = [pair["label"] for pair in pairs]
+
+    report = {}
+    for quantize in (False, True):
+        model_ = scheme2.load_model(quantize = quantize, max_seq_length = max_seq_length)
+        start_time = time.time()
+        scores = _pair_scores(model_, text_pairs)
+        elapsed = time.time() - start_time
+        df = pd.DataFrame({"score": scores, "class_label": labels})
+        accuracy = ((df['score'] >= RELEVANCE_THRESHOLD).astype(int) == df['class_label']).mean()
+        report[quantize] = (scores, elapsed, accuracy, best_threshold(df))
+
+    (fp32_scores, fp32_time, fp32_accuracy, _) = report[False]
+    (int8_scores, int8_time, int8_accuracy, (int8_threshold, int8_best_accuracy)) = report[True]
+    mean_diff = sum(abs(a - b) for (a, b) in zip(fp32_scores, int8_scores)) / len(pairs)
+
+    print(f'fp32 耗时 {fp32_time:.2f} 秒，int8 耗时 {int8_time:.2f} 秒，加速 {fp32_time / int8_time:.2f} 倍')
+    print(f'得分的平均绝对差为: {mean_diff:.4f}')
+    print(f'在 RELEVANCE_THRESHOLD = {RELEVANCE_THRESHOLD} 下，fp32 的分类准确率为: {fp32_accuracy}（ACCURACY = {ACCURACY}），int8 的分类准确率为: {int8_accuracy}')
+    print(f'int8 的最优阈值为: {int8_threshold}，对应的分类准确率为: {int8_best_accuracy}')
 
 
 if __name__ == '__main__':
     cal_scores()
     cal_best_score()
+    cal_cascade_thresholds()
+    cal_route_thresholds()
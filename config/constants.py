@@ -20,21 +20,114 @@ COMMON_HEADERS: Dict[str, str] = {
     'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.6261.95 Safari/537.36',
 }
 
-# 向同一个 URL 的最大并发数量
+# 向同一个主机的最大并发数量，即自适应并发限制器（utils.limiter）的上限
 CONCURRENCY_NUMBER: int = 100
 
+# 自适应并发限制器的初始并发数量。请求顺利时每轮加 1 ，出错、超时或被限流时乘以 LIMITER_DECREASE_FACTOR
+LIMITER_INITIAL_LIMIT: int = 4
+
+# 出错、超时或被限流时，并发上限乘以的系数
+LIMITER_DECREASE_FACTOR: float = 0.5
+
+# 请求的延迟超过基线（近期的最小延迟）的多少倍时，不再增加并发上限
+LIMITER_LATENCY_TOLERANCE: float = 2.0
+
+# 共享的 aiohttp 连接池的总连接数上限
+CONNECTION_LIMIT: int = 100
+
+# 共享的 aiohttp 连接池中，与同一个主机的连接数上限
+CONNECTION_LIMIT_PER_HOST: int = 20
+
+# 空闲连接保持的秒数，期间可被后续请求复用
+KEEPALIVE_TIMEOUT: float = 30
+
+# DNS 解析结果的缓存秒数
+DNS_CACHE_TTL: int = 300
+
 # 最大并发线程数量
 MAX_WORKERS: int = os.cpu_count() or 4 # 默认为系统的核数。若返回 None，则默认为 4
 
-# 请求失败时，同一个请求的最大重发次数
+# 打分所用的执行器："thread"（线程池）或 "process"（进程池，每个进程各加载一次模型）
+SCORING_BACKEND: str = "thread"
+
+# 进程池的最大进程数。每个进程各加载一次模型（XLM-R 约 1 GB），不随核数增长
+SCORING_MAX_PROCESSES: int = 2
+
+# 在图书馆查询论文时每页的结果数。查询更多结果时会并发地翻页
+PAGE_SIZE: int = 50
+
+# 自适应查询时第一页的结果数。之后每页翻倍（不超过 PAGE_SIZE ），直到某一页没有被接受的论文
+FIRST_PAGE_SIZE: int = 10
+
+# 请求失败时，同一个请求的最大发送次数（含第一次）
 RETRANSMISSION: int = 16
 
+# 重试的退避时间的基数（秒）。第 n 次重试前随机等待 0 ~ min(RETRY_MAX_DELAY, 基数 × 2^(n-1)) 秒，被限流时基数再乘 4
+RETRY_BASE_DELAY: float = 0.5
+
+# 单次重试的退避时间的上限（秒）
+RETRY_MAX_DELAY: float = 30
+
+# 每个主机的重试预算：每个请求可为重试贡献的令牌数，即发往该主机的重试次数与请求数之比的上限
+RETRY_BUDGET_RATIO: float = 0.2
+
+# 每个主机的重试预算的初始令牌数
+RETRY_BUDGET_RESERVE: int = 20
+
+# 单个请求的总超时（秒），包括连接、发送和读取响应
+REQUEST_TIMEOUT: float = 30
+
+# 单个请求建立连接的超时（秒）
+REQUEST_CONNECT_TIMEOUT: float = 10
+
+# 爬取基本数据阶段的截止时间（秒）。到时放弃未完成的老师，已完成的保留在检查点日志中，不覆盖已有的输出。None 表示不限
+GENERAL_STAGE_DEADLINE: float | None = None
+
+# 爬取论文数据阶段的截止时间（秒）。到时放弃未完成的老师，已完成的保留在检查点日志中，不覆盖已有的输出。None 表示不限
+PAPER_STAGE_DEADLINE: float | None = None
+
+# 是否发出对冲请求：请求超过该主机最近成功请求延迟的 p95 仍未返回时，再发一个相同的请求，采用先返回的
+HEDGING: bool = True
+
+# 对冲请求：主机至少有多少个成功请求的延迟样本后才启用
+HEDGE_MIN_SAMPLES: int = 20
+
+# 论文数据的流水线中同时处理的同名老师组数，也是各阶段队列的容量
+PIPELINE_WINDOW: int = 64
+
+# 每隔多少秒打印一次流水线各阶段的队列深度
+PIPELINE_REPORT_INTERVAL: float = 10
+
+# 流式写入 JSON Lines 文件时，刷新到磁盘的间隔（秒）
+WRITER_FLUSH_INTERVAL: float = 1.0
+
+# 流式写入 JSON Lines 文件时，等待写入的最大条数
+WRITER_QUEUE_SIZE: int = 10000
+
+# 熔断器：同一主机连续失败多少次后熔断，熔断期间的请求直接失败，不再消耗重试
+BREAKER_FAILURE_THRESHOLD: int = 5
+
+# 熔断器：熔断多少秒后放行一个探测请求，成功则恢复，失败则继续熔断
+BREAKER_COOLDOWN: float = 30
+
+# 熔断器：因熔断而被推迟的工作最多处理几轮（含第一轮），之后放弃
+BREAKER_MAX_PASSES: int = 3
+
 # 默认的存放数据的文件夹
 DATA_DIR: str = "./data"
 
 # 文本文件的编码方式
 FILE_ENCODING: str = "utf-8"
 
+# 保存 jwtToken 的路径，有效期内再次运行时直接复用
+JWT_TOKEN_PATH: str = os.path.join(DATA_DIR, "jwt_token.json")
+
+# 在 jwtToken 过期前多少秒主动刷新
+TOKEN_REFRESH_MARGIN: float = 300
+
+# 断点续爬的检查点日志的路径，记录已完成的学院和老师及其结果
+CHECKPOINT_PATH: str = os.path.join(DATA_DIR, "checkpoint.jsonl")
+
 # all_data.jsonl 的路径
 ALL_DATA_FILE_PATH: str = os.path.join(DATA_DIR, "all_data.jsonl")
 _dir_path = os.path.dirname(ALL_DATA_FILE_PATH)
@@ -98,8 +191,44 @@ STOPWORDS: Set[str] = {
     '"', "'", '`', '|', '\\', '/', '@', '#', '$', '%', '^', '&', '*', '_', '+', '=', '§', '†', '‡',
 }
 
+# scheme1 的分词缓存（LRU）最多缓存的文本数量
+TOKEN_CACHE_SIZE: int = 65536
+
+# jieba 序列化后的前缀词典的路径，使之后的运行和各个工作进程无需重新构建词典
+JIEBA_CACHE_PATH: str = os.path.join(DATA_DIR, "jieba.cache")
+
 # 计算文本相关性所用的跨语言模型，用于 text_relevance.cross_Language_modeling_scheme
 CROSS_LANGUAGE_MODEL: str = "xlm-r-bert-base-nli-stsb-mean-tokens"
 
-# 计算文本相关性的方案
-from src.text_relevance import scheme2 as SCHEME
+# scheme1 在固定语料上拟合好的 TF-IDF 模型及与之配套的阈值的路径。删除此文件即恢复逐对拟合
+TFIDF_MODEL_PATH: str = os.path.join(DATA_DIR, "tfidf_vectorizer.pkl")
+
+# 组合方案（cascade、router）的标定结果的路径，由 calculate_scheme2_threshold.py 中的标定函数生成
+CALIBRATION_PATH: str = os.path.join(DATA_DIR, "calibration.json")
+
+# scheme2 的向量缓存（SQLite 数据库）的路径
+EMBEDDING_CACHE_PATH: str = os.path.join(DATA_DIR, "embedding_cache.sqlite3")
+
+# scheme2 的向量缓存的大小上限（字节），超出后淘汰最久未用的向量。若不大于 0 ，则不使用缓存
+EMBEDDING_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+# scheme2 是否对模型的线性层做动态 int8 量化。只在 CPU 上推理时使用，速度更快，但得分会略有变化
+QUANTIZE_MODEL: bool = False
+
+# scheme2 的最大序列长度（token 数），更长的文本会被截断。0 表示使用模型的默认值
+MAX_SEQ_LENGTH: int = 0
+
+# scheme2 编码时每一批的 token 预算（批大小 × 批内最长长度的上限）。文本按长度分桶，减少填充
+ENCODE_TOKEN_BUDGET: int = 8192
+
+# 是否把同一进程内各线程的 scheme2 编码请求合并成批（微批处理）。配合 SCORING_BACKEND = "thread" 使用
+MICRO_BATCH: bool = False
+
+# 微批处理时每一批最多的文本数
+MICRO_BATCH_SIZE: int = 256
+
+# 微批处理时最早的请求最多等待的毫秒数
+MICRO_BATCH_WAIT_MS: float = 10
+
+# 计算文本相关性的方案，即 src.text_relevance 下的模块名："scheme1"、"scheme2"、"cascade" 或 "router"。在首次打分时才会被导入
+SCHEME: str = "scheme2"
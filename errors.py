@@ -1,2 +1,20 @@
 class DataParseError(Exception):
     pass
+
+
+class UnauthorizedError(Exception):
+    """
+    服务器返回 401 ，通常是因为 jwtToken 已过期。
+    """
+    pass
+
+
+class CircuitOpenError(Exception):
+    """
+    目标主机的熔断器处于打开状态，请求未被发送。
+    """
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"circuit for {host!r} is open, retry after {retry_after:.1f} seconds")
+        self.host = host
+        self.retry_after = retry_after
@@ -1,9 +1,29 @@
 from __future__ import annotations
 from functools import cache
 import re
-from typing import Any, Dict, Iterable, List, Set
+from typing import Any, Dict, Iterable, List, Set, Tuple
 
-from config.constants import SCHEME
+from src.text_relevance import get_scheme
+
+
+# 提取作者姓名时读取的 pnx 字段，`(节, 字段)`
+CREATOR_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("search", "creatorcontrib"),
+    ("search", "creator"),
+    ("display", "creator"),
+    ("sort", "author"),
+    ("addata", "au"),
+    ("facets", "creatorcontrib"),
+)
+
+# 提取文献类型时依次尝试的 pnx 字段，取第一个非空的字段
+TYPE_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("search", "rsrctype"),
+    ("search", "recordtype"),
+    ("display", "type"),
+    ("control", "recordtype"),
+    ("addata", "genre"),
+)
 
 
 
@@ -103,17 +123,7 @@ class Document():
 
         # `creator_strings` is like:
         # ["武相军 王春淋 阚海斌", "武相军 王春淋 阚海斌", "武相军 王春淋 阚海斌"]
-        creator_strings = sum(
-            (
-                pnx.get("search", {}).get("creatorcontrib", []),
-                pnx.get("search", {}).get("creator", []),
-                pnx.get("display", {}).get("creator", []),
-                pnx.get("sort", {}).get("author", []),
-                pnx.get("addata", {}).get("au", []),
-                pnx.get("facets", {}).get("creatorcontrib", []),
-            ),
-            start = []
-        )
+        creator_strings = _pnx_creator_strings(pnx)
 
         # `creator` is like:
         # {"武相军", "王春淋", "阚海斌"}
@@ -180,13 +190,7 @@ class Document():
 
         # `type` is like:
         # "article"
-        type: str = "\n".join(
-            pnx.get("search", {}).get("rsrctype", []) or
-            pnx.get("search", {}).get("recordtype", []) or
-            pnx.get("display", {}).get("type", []) or
-            pnx.get("control", {}).get("recordtype", []) or
-            pnx.get("addata", {}).get("genre", [])
-        )
+        type: str = _pnx_type(pnx)
 
         #### 提取文献语言 ####
 
@@ -247,6 +251,23 @@ class Document():
         )
 
 
+    @staticmethod
+    def pnx_matches(pnx: Dict[str, Any], name: str, type: str = "article") -> bool:
+        """
+        直接在查询结果的 pnx 字段上判断文献类型是否为 `type` ，且作者中是否包含 `name` 。
+
+        与 `Document.from_pnx(pnx)` 的 `type` 、 `creator` 判断结果一致，但不构造 `Document` 对象，
+        可以在构造之前排除大部分查询结果。
+        """
+        if _pnx_type(pnx) != type:
+            return False
+        return any(
+            name in re.split(r"\s+", creator_string)
+            for creator_string in _pnx_creator_strings(pnx)
+            if name in creator_string # 先做子串判断，多数结果无需切分
+        )
+
+
     def _get_comparable_text(self) -> str:
         subject = "，".join(self.subject_cn)
         texts = (
@@ -265,11 +286,34 @@ class Document():
         """
         if teacher_info["name"] not in self.creator:
             return 0
-        return SCHEME.text_relevance(teacher_info["subject"], self._get_comparable_text())
+        return get_scheme().text_relevance(teacher_info["subject"], self._get_comparable_text())
 
 
     def is_by_teacher(self, teacher_info: Dict[str, str]) -> bool:
         """
         判断这篇文章是否是由这位老师写的。
         """
-        return self.by_teacher_score(teacher_info) >= SCHEME.RELEVANCE_THRESHOLD
+        return self.by_teacher_score(teacher_info) >= get_scheme().RELEVANCE_THRESHOLD
+
+
+
+def _pnx_creator_strings(pnx: Dict[str, Any]) -> List[str]:
+    """
+    读取 pnx 中所有记录作者的字符串。
+    """
+    return [
+        creator_string
+        for (section, field) in CREATOR_FIELDS
+        for creator_string in pnx.get(section, {}).get(field, [])
+    ]
+
+
+def _pnx_type(pnx: Dict[str, Any]) -> str:
+    """
+    读取 pnx 中的文献类型。
+    """
+    for (section, field) in TYPE_FIELDS:
+        values = pnx.get(section, {}).get(field, [])
+        if values:
+            return "\n".join(values)
+    return ""
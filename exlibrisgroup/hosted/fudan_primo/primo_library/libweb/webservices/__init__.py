@@ -1,2 +1,2 @@
 from .rest.v1 import guestJwt, async_guestJwt
-from .rest.primo_explore.v1 import pnxs, async_pnxs
+from .rest.primo_explore.v1 import pnxs, async_pnxs, pnxs_page, async_pnxs_page, page_slices
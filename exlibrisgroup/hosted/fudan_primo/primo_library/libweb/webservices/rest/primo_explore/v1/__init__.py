@@ -1 +1 @@
-from .pnxs import pnxs, async_pnxs
+from .pnxs import pnxs, async_pnxs, pnxs_page, async_pnxs_page, page_slices
@@ -1,12 +1,14 @@
 import aiohttp
+import asyncio
 import json
 import requests
 import urllib.parse
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from .......__init__ import domain, base_url
 from config.constants import COMMON_HEADERS
-from errors import DataParseError
+from errors import DataParseError, UnauthorizedError
+from utils.aiohttp import borrow_client_session
 
 
 def _get_referer_query_str(search_text: str, bulk_size: int, institution: str) -> str:
@@ -24,7 +26,7 @@ def _get_referer_query_str(search_text: str, bulk_size: int, institution: str) -
     })
 
 
-def _get_query_str(search_text: str, limit: int, institution: str) -> str:
+def _get_query_str(search_text: str, limit: int, institution: str, offset: int = 0) -> str:
     return urllib.parse.urlencode({
         "acTriggered"                       : "false",
         "blendFacetsSeparately"             : "true",
@@ -37,7 +39,7 @@ def _get_query_str(search_text: str, limit: int, institution: str) -> str:
         "mode"                              : "basic",
         "newspapersActive"                  : "false",
         "newspapersSearch"                  : "false",
-        "offset"                            : "0",
+        "offset"                            : str(offset),
         "otbRanking"                        : "false",
         "pcAvailability"                    : "true",
         "q"                                 : f"any,contains,{search_text}",
@@ -54,7 +56,7 @@ def _get_query_str(search_text: str, limit: int, institution: str) -> str:
     })
 
 
-def _get_arguments(jwt_token: str, search_text: str, limit: int, institution: str) -> Dict[str, str]:
+def _get_arguments(jwt_token: str, search_text: str, limit: int, institution: str, offset: int = 0) -> Dict[str, str]:
     """
     获取必要的请求参数。
 
@@ -64,10 +66,11 @@ def _get_arguments(jwt_token: str, search_text: str, limit: int, institution: st
     - `search_text`: 搜索框内的文本，如 `"阚海斌"` 。
     - `limit`      : 单次返回的搜索结果数，如 `10` 。
     - `institution`: 发起请求者的身份，如 `"FDU"` 。
+    - `offset`     : 跳过的搜索结果数，用于翻页。
     """
     referer = urllib.parse.urljoin(base_url, "/primo-explore/search") + "?" + _get_referer_query_str(search_text, limit, institution)
 
-    url = urllib.parse.urljoin(base_url, "/primo_library/libweb/webservices/rest/primo-explore/v1/pnxs") + "?" + _get_query_str(search_text, limit, institution)
+    url = urllib.parse.urljoin(base_url, "/primo_library/libweb/webservices/rest/primo-explore/v1/pnxs") + "?" + _get_query_str(search_text, limit, institution, offset)
 
     headers = COMMON_HEADERS | {
         'Accept': 'application/json, text/plain, */*',
@@ -85,9 +88,71 @@ def _get_arguments(jwt_token: str, search_text: str, limit: int, institution: st
     }
 
 
-def pnxs(jwt_token: str, search_text: str, limit: int, institution: str, **kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+def page_slices(limit: int, page_size: int, total: int) -> List[Tuple[int, int]]:
     """
-    发送查询请求。
+    返回第一页之后各页的 `(offset, limit)` ，不超过 `limit` 条，也不超过搜索结果的总数 `total` 。
+    """
+    end = min(limit, total)
+    return [(offset, min(page_size, end - offset)) for offset in range(page_size, end, page_size)]
+
+
+def pnxs_page(jwt_token: str, search_text: str, limit: int, institution: str, offset: int = 0, **kwargs: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    发送一次查询请求，获取一页搜索结果。
+
+    同步函数。
+
+    Params:
+
+    - `offset`: 跳过的搜索结果数。
+    - 其余参数见 pnxs() 。
+
+    Return like: 见 parse_page()
+
+    Raise:
+
+    - `UnauthorizedError`: jwtToken 无效或已过期。
+    - 其他 4xx/5xx 状态码：`requests.HTTPError` 或 `aiohttp.ClientResponseError` 。
+    """
+    arguments = kwargs | _get_arguments(jwt_token, search_text, limit, institution, offset)
+    response = requests.get(**arguments)
+    if response.status_code == 401:
+        raise UnauthorizedError(f"jwtToken is rejected when searching {search_text!r}")
+    response.raise_for_status()
+    return parse_page(response.text)
+
+
+async def async_pnxs_page(jwt_token: str, search_text: str, limit: int, institution: str, offset: int = 0, session: aiohttp.ClientSession = None, **kwargs: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    发送一次查询请求，获取一页搜索结果。
+
+    异步函数。
+
+    Params:
+
+    - `offset`: 跳过的搜索结果数。
+    - 其余参数见 async_pnxs() 。
+
+    Return like: 见 parse_page()
+
+    Raise:
+
+    - `UnauthorizedError`: jwtToken 无效或已过期。
+    - 其他 4xx/5xx 状态码：`requests.HTTPError` 或 `aiohttp.ClientResponseError` 。
+    """
+    arguments = kwargs | _get_arguments(jwt_token, search_text, limit, institution, offset)
+    async with borrow_client_session(session) as client:
+        async with client.get(**arguments) as response:
+            if response.status == 401:
+                raise UnauthorizedError(f"jwtToken is rejected when searching {search_text!r}")
+            # 429/503/5xx 抛出 `aiohttp.ClientResponseError` ，由 utils.retry.classify() 和限制器按状态码处理
+            response.raise_for_status()
+            return parse_page(await response.text())
+
+
+def pnxs(jwt_token: str, search_text: str, limit: int, institution: str, page_size: int = None, **kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    发送查询请求。若 `limit` 大于 `page_size` ，则逐页查询，直到取满 `limit` 条或取完所有搜索结果。
 
     同步函数。
 
@@ -95,20 +160,25 @@ def pnxs(jwt_token: str, search_text: str, limit: int, institution: str, **kwarg
 
     - `jwt_token`  : guestJwt() 返回的令牌。
     - `search_text`: 搜索框内的文本，如 `"阚海斌"` 。
-    - `limit`      : 单次返回的搜索结果数，如 `10` 。
+    - `limit`      : 最多返回的搜索结果数，如 `10` 。
     - `institution`: 发起请求者的身份，如 `"FDU"` 。
+    - `page_size`  : 每页的搜索结果数。若为 `None` ，则只查询一页。
     - `kwargs`     : 其他传递给 requests.get() 的参数，可以设置 timeout、 proxies 等。
 
-    Return like: 见 parse_data()
+    Return like: 见 parse_data() ，按相关度排序。
     """
-    arguments = kwargs | _get_arguments(jwt_token, search_text, limit, institution)
-    response = requests.get(**arguments)
-    return parse_data(response.text)
+    page_size = page_size or limit
+    (results, total) = pnxs_page(jwt_token, search_text, min(limit, page_size), institution, 0, **kwargs)
+    for (offset, size) in page_slices(limit, page_size, total):
+        results.extend(pnxs_page(jwt_token, search_text, size, institution, offset, **kwargs)[0])
+    return results
 
 
-async def async_pnxs(jwt_token: str, search_text: str, limit: int, institution: str, **kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+async def async_pnxs(jwt_token: str, search_text: str, limit: int, institution: str, page_size: int = None, session: aiohttp.ClientSession = None, **kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
-    发送查询请求。
+    发送查询请求。若 `limit` 大于 `page_size` ，则先查询第一页得到搜索结果的总数，再并发查询其余各页。
+
+    并发数受 `session` 的连接池限制。各页不经过限制器、熔断器和重试，需要时应逐页调用 async_pnxs_page() ，见 `Session._async_fetch_pages()` 。
 
     异步函数。
 
@@ -116,16 +186,25 @@ async def async_pnxs(jwt_token: str, search_text: str, limit: int, institution:
 
     - `jwt_token`  : guestJwt() 返回的令牌。
     - `search_text`: 搜索框内的文本，如 `"阚海斌"` 。
-    - `limit`      : 单次返回的搜索结果数，如 `10` 。
+    - `limit`      : 最多返回的搜索结果数，如 `10` 。
     - `institution`: 发起请求者的身份，如 `"FDU"` 。
-    - `kwargs`     : 其他传递给 requests.get() 的参数，可以设置 timeout、 proxies 等。
+    - `page_size`  : 每页的搜索结果数。若为 `None` ，则只查询一页。
+    - `session`    : 复用的 `aiohttp.ClientSession` 。若为 `None` ，则临时创建一个。
+    - `kwargs`     : 其他传递给 aiohttp.ClientSession.get() 的参数，可以设置 timeout、 proxies 等。
 
-    Return like: 见 parse_data()
+    Return like: 见 parse_data() ，按相关度排序。
     """
-    arguments = kwargs | _get_arguments(jwt_token, search_text, limit, institution)
-    async with aiohttp.ClientSession() as session:
-        async with session.get(**arguments) as response:
-            return parse_data(await response.text())
+    page_size = page_size or limit
+    async with borrow_client_session(session) as client:
+        (results, total) = await async_pnxs_page(jwt_token, search_text, min(limit, page_size), institution, 0, session = client, **kwargs)
+        pages = await asyncio.gather(*(
+            async_pnxs_page(jwt_token, search_text, size, institution, offset, session = client, **kwargs)
+            for (offset, size) in page_slices(limit, page_size, total)
+        ))
+    # asyncio.gather() 按提交顺序返回，合并后仍按相关度排序
+    for (page, _) in pages:
+        results.extend(page)
+    return results
 
 
 def parse_data(text: str) -> List[Dict[str, Any]]:
@@ -134,7 +213,7 @@ def parse_data(text: str) -> List[Dict[str, Any]]:
 
     Params:
 
-    - `text`: pnxs() 或 async_pnxs() 的响应内容。
+    - `text`: 一次查询请求的响应内容。
 
     Return like:
 
@@ -284,6 +363,23 @@ def parse_data(text: str) -> List[Dict[str, Any]]:
     ]
     ```
     """
+    return parse_page(text)[0]
+
+
+def parse_page(text: str) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    解析响应的返回内容，同时读出搜索结果的总数。
+
+    Params:
+
+    - `text`: pnxs_page() 或 async_pnxs_page() 的响应内容。
+
+    Return like:
+
+    ```python
+    ([...], 1234) # (本页的搜索结果，见 parse_data() ；搜索结果的总数)
+    ```
+    """
     if not isinstance(text, str):
         raise TypeError(f"`text` should be a `str`, but got `{type(text).__name__}`")
 
@@ -295,4 +391,6 @@ def parse_data(text: str) -> List[Dict[str, Any]]:
     if "docs" not in json_data:
         raise DataParseError(f"Unexcepted JSON format data: {json_data}")
 
-    return [doc.get("pnx", {}) for doc in json_data["docs"]]
+    results = [doc.get("pnx", {}) for doc in json_data["docs"]]
+    total = json_data.get("info", {}).get("total", len(results))
+    return (results, int(total))
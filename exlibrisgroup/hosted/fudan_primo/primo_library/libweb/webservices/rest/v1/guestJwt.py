@@ -7,6 +7,7 @@ from typing import Any, Dict, List
 
 from ......__init__ import domain, base_url
 from config.constants import COMMON_HEADERS
+from utils.aiohttp import borrow_client_session
 
 
 def _get_arguments(institution: str) -> Dict[str, str]:
@@ -64,16 +65,17 @@ def guestJwt(institution: str, **kwargs: Dict[str, Any]):
     return json.loads(response.text)
 
 
-async def async_guestJwt(institution: str, **kwargs: Dict[str, Any]):
+async def async_guestJwt(institution: str, session: aiohttp.ClientSession = None, **kwargs: Dict[str, Any]):
     """
     获取 jwtToken 。
 
-    同步函数。
+    异步函数。
 
     Params:
 
     - `institution`: 发起查询请求者的身份，如 `"FDU"` 。
-    - `kwargs`: 其他传递给 `requests.get()` 的参数，可以设置 timeout、 proxies 等。
+    - `session`    : 复用的 `aiohttp.ClientSession` 。若为 `None` ，则临时创建一个。
+    - `kwargs`: 其他传递给 `aiohttp.ClientSession.get()` 的参数，可以设置 timeout、 proxies 等。
 
     Return like:
 
@@ -82,6 +84,6 @@ async def async_guestJwt(institution: str, **kwargs: Dict[str, Any]):
     ```
     """
     arguments = kwargs | _get_arguments(institution)
-    async with aiohttp.ClientSession() as session:
-        async with session.get(**arguments) as response:
+    async with borrow_client_session(session) as client:
+        async with client.get(**arguments) as response:
             return json.loads(await response.text())
@@ -0,0 +1,307 @@
+"""
+论文数据的流水线：查询（fetch）→ 解析（parse）→ 打分（score）→ 输出（emit）。
+
+各阶段之间用有界的 `asyncio.Queue` 连接，由不同的工作协程并发处理：
+
+- fetch：向图书馆查询一页结果，受图书馆主机的限制器、熔断器和重试策略约束，见 `Session._async_fetch()` 。
+- parse：预筛选并构造 `Document` 对象，在线程池中进行。
+- score：计算相关性并分配论文，在 `Session.executor` 中进行。自适应查询需要下一页时，回到 fetch 队列。
+- emit ：组装论文信息，交给等待结果的调用者。
+
+打分在执行器中进行时，事件循环仍在处理其他老师的请求，网络和 CPU 同时忙碌，而不是轮流工作。
+同时在流水线中的同名老师组数不超过 `PIPELINE_WINDOW` ，因此各队列（容量同为该值）的 `put()` 不会因回流而死锁。
+
+Usage:
+
+```python
+async with Session() as session:
+    async with PaperPipeline(session) as pipeline:
+        (paper_infos, complete) = await pipeline.submit(homonyms) # homonyms: 同名老师的基本信息列表；paper_infos: 各位老师的论文信息
+        (assigned, complete) = await pipeline.search(homonyms)    # 分给各位老师的 Document 对象
+        print(pipeline.depths())
+```
+"""
+
+from __future__ import annotations
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from config.constants import PIPELINE_WINDOW, PIPELINE_REPORT_INTERVAL, MAX_WORKERS
+from src.text_relevance import get_scheme, score_matrix
+from .document import Document
+from .hosted.fudan_primo.primo_library.libweb.webservices import async_pnxs_page
+
+if TYPE_CHECKING:
+    from .spider import Session
+
+
+STAGES: Tuple[str, ...] = ("fetch", "parse", "score", "emit")
+
+
+class _Job():
+    """
+    流水线中的一组同名老师。
+    """
+
+    def __init__(self, homonyms: List[Dict[str, str]], size: int, future: asyncio.Future):
+        self.homonyms = homonyms
+        self.name = homonyms[0]["name"]
+        self.future = future
+
+        self.offset = 0   # 当前页的起始位置
+        self.size = size  # 当前页的大小
+        self.total = 0    # 结果总数
+        self.assigned: List[List[Document]] = [[] for _ in homonyms]
+        self.plan: List[str] = [] # 每页的 "条目数(接受数)"
+        self.reason = ""          # 停止原因
+        self.complete = True      # 是否所有请求都成功。若否，则结果可能不完整
+
+        self.pnx_infos: List[Dict[str, Any]] = []
+        self.candidates: List[Document] = []
+        self.queries: List[str] = []
+        self.texts: List[str] = []
+        self.paper_infos: List[List[Dict[str, str]]] = [] # 与 homonyms 一一对应
+
+
+class PaperPipeline():
+    """
+    论文数据的流水线，须作为异步上下文管理器使用。
+    """
+
+    def __init__(self, session: Session, window: int = PIPELINE_WINDOW, score_workers: int = MAX_WORKERS, **kwargs: Dict[str, Any]):
+        """
+        Params:
+
+        - `session`      : 提供 jwtToken 、连接池、查询参数和执行器的 `Session` 。
+        - `window`       : 同时在流水线中的同名老师组数，也是 fetch 阶段的工作协程数。
+        - `score_workers`: score 阶段的工作协程数，应与执行器的工作线程（进程）数相当。
+        - `kwargs`       : 其他传递给 async_pnxs_page() 的参数。
+        """
+        self.session = session
+        self.window = window
+        self.score_workers = score_workers
+        self.kwargs = kwargs
+
+        self.queues: Dict[str, asyncio.Queue[_Job]] = {}
+        self.max_depths: Dict[str, int] = dict.fromkeys(STAGES, 0)
+        self.in_flight = 0
+        self.completed = 0
+        self._admission: asyncio.Semaphore | None = None
+        self._workers: List[asyncio.Task] = []
+
+
+    async def __aenter__(self) -> PaperPipeline:
+        self.queues = {stage: asyncio.Queue(maxsize = self.window) for stage in STAGES}
+        self._admission = asyncio.Semaphore(self.window)
+        workers = (
+            [self._fetch_worker() for _ in range(self.window)]
+            + [self._parse_worker()]
+            + [self._score_worker() for _ in range(self.score_workers)]
+            + [self._emit_worker(), self._report()]
+        )
+        self._workers = [asyncio.create_task(worker) for worker in workers]
+        return self
+
+
+    async def __aexit__(self, *exc_info) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions = True)
+        self._workers = []
+
+
+    def depths(self) -> Dict[str, int]:
+        """
+        Return like:
+
+        ```python
+        {"fetch": 12, "parse": 0, "score": 3, "emit": 0, "in_flight": 64, "completed": 210}
+        ```
+        """
+        return {stage: queue.qsize() for (stage, queue) in self.queues.items()} | {
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+        }
+
+
+    async def submit(self, homonyms: List[Dict[str, str]]) -> Tuple[List[List[Dict[str, str]]], bool]:
+        """
+        把一组同名老师送入流水线，等待其论文信息。流水线已满时等待空位。
+
+        Return:
+
+        - `(与 homonyms 一一对应的论文信息列表, 是否完整)` 。某次请求用尽重试次数后仍失败时，结果不完整。
+          每篇论文只分给一位老师，即使几位老师的 `person_id` 相同（如都为空）也不会重复。
+
+        Raise:
+
+        - `CircuitOpenError` ：图书馆主机已被熔断。
+        """
+        job = await self._run(homonyms)
+        return (job.paper_infos, job.complete)
+
+
+    async def search(self, homonyms: List[Dict[str, str]]) -> Tuple[List[List[Document]], bool]:
+        """
+        与 submit() 相同，但返回分给各位老师的 `Document` 对象。
+
+        Return:
+
+        - `(与 homonyms 一一对应的论文列表, 是否完整)` 。
+        """
+        job = await self._run(homonyms)
+        return (job.assigned, job.complete)
+
+
+    async def _run(self, homonyms: List[Dict[str, str]]) -> _Job:
+        async with self._admission:
+            print(f"开始爬取 {homonyms[0]['name']} 老师的论文数据（同名 {len(homonyms)} 人）。")
+            size = min(self.session.first_page_size, self.session.limit) if self.session.adaptive else self.session.limit
+            job = _Job(homonyms, size, asyncio.get_running_loop().create_future())
+            self.in_flight += 1
+            try:
+                await self._put("fetch", job)
+                return await job.future
+            finally:
+                self.in_flight -= 1
+
+
+    async def _put(self, stage: str, job: _Job) -> None:
+        queue = self.queues[stage]
+        await queue.put(job)
+        self.max_depths[stage] = max(self.max_depths[stage], queue.qsize())
+
+
+    async def _fetch_worker(self) -> None:
+        while True:
+            job = await self.queues["fetch"].get()
+            try:
+                await self._fetch(job)
+            except Exception as error: # 包括 CircuitOpenError
+                _fail(job, error)
+
+
+    async def _fetch(self, job: _Job) -> None:
+        session = self.session
+        arguments = session._search_arguments(job.name, **self.kwargs)
+        if session.adaptive:
+            page = await session._async_fetch(job.name, async_pnxs_page, **(arguments | {"limit": job.size, "offset": job.offset}))
+        else:
+            pages = await session._async_fetch_pages(job.name, **({"limit": job.size, "page_size": session.page_size} | arguments))
+            # 部分页失败时保留其余各页，但结果不完整
+            page = None if pages is None else (pages[0], len(pages[0]))
+            job.complete = job.complete and (pages is not None) and pages[1]
+        if page is None:
+            job.reason = "请求失败"
+            job.complete = False
+            await self._put("emit", job)
+            return
+        (job.pnx_infos, job.total) = page
+        await self._put("parse", job)
+
+
+    async def _parse_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queues["parse"].get()
+            try:
+                (job.candidates, job.queries, job.texts) = await loop.run_in_executor(
+                    None, self.session._prepare_articles, job.homonyms, job.pnx_infos
+                )
+                await self._put("score", job)
+            except Exception as error:
+                _fail(job, error)
+
+
+    async def _score_worker(self) -> None:
+        while True:
+            job = await self.queues["score"].get()
+            try:
+                await self._score(job)
+            except Exception as error:
+                _fail(job, error)
+
+
+    async def _score(self, job: _Job) -> None:
+        session = self.session
+        matrix = await asyncio.get_running_loop().run_in_executor(session.executor, score_matrix, job.queries, job.texts)
+        page_assigned = assign_articles(job.candidates, matrix)
+        accepted = sum(map(len, page_assigned))
+        for (articles, page_articles) in zip(job.assigned, page_assigned):
+            articles.extend(page_articles)
+        job.plan.append(f"{len(job.pnx_infos)}({accepted})")
+
+        if not session.adaptive:
+            job.reason = f"一次查询 {job.size} 条"
+            await self._put("emit", job)
+            return
+        job.offset += job.size
+        (job.size, job.reason) = session._next_page_size(job.offset, job.size, job.total, len(job.pnx_infos), accepted)
+        await self._put("fetch" if job.size else "emit", job)
+
+
+    async def _emit_worker(self) -> None:
+        while True:
+            job = await self.queues["emit"].get()
+            try:
+                print(f"{job.name} 老师的查询计划：{' → '.join(job.plan) or '无'}，共接受 {sum(map(len, job.assigned))} 篇；停止原因：{job.reason}。")
+                job.paper_infos = [
+                    [assembly_data(teacher_info, article) for article in articles]
+                    for (teacher_info, articles) in zip(job.homonyms, job.assigned)
+                ]
+            except Exception as error:
+                _fail(job, error)
+                continue
+            self.completed += 1
+            if not job.future.done():
+                job.future.set_result(job)
+
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(PIPELINE_REPORT_INTERVAL)
+            print(f"流水线队列深度：{self.depths()}")
+
+
+def _fail(job: _Job, error: Exception) -> None:
+    """
+    以 `error` 结束 `job` ，使等待它的调用者收到异常。工作协程继续处理下一个。
+    """
+    if not job.future.done():
+        job.future.set_exception(error)
+
+
+def assign_articles(candidates: List[Document], matrix: List[List[float]]) -> List[List[Document]]:
+    """
+    把每篇文章分给得分最高的老师，最高得分低于阈值的文章被丢弃。
+
+    Params:
+
+    - `candidates`: 候选文章。
+    - `matrix`    : 形状为 `(老师数, len(candidates))` 的得分。
+
+    Return:
+
+    - 与 `matrix` 的各行一一对应的文章列表。
+    """
+    threshold = get_scheme().RELEVANCE_THRESHOLD
+    assigned: List[List[Document]] = [[] for _ in matrix]
+    for (idx, article) in enumerate(candidates, start = 0):
+        (best, score) = max(enumerate((row[idx] for row in matrix), start = 0), key = lambda item: item[1])
+        if score >= threshold:
+            assigned[best].append(article)
+    return assigned
+
+
+def assembly_data(teacher_info: Dict[str, str], article: Document) -> Dict[str, str]:
+    return {
+        "person_id": teacher_info.get("person_id", ""),
+        "author_cn": teacher_info["name"],
+        "author_en": "",
+        "author_email": teacher_info["email"],
+        "title_cn": article.title_cn,
+        "title_en": article.title_en,
+        "keyword_cn": "；".join(article.subject_cn),
+        "keyword_en": "；".join(article.subject_en),
+        "article_info": f"{article.title_cn} {article.title_en} {article.description_cn} {article.description_en}",
+    }
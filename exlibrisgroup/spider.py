@@ -17,42 +17,71 @@ Usage:
     ...same as the code above
     ```
 
-3. 筛选论文数据时，应用多线程并发加速：
+3. 作为异步上下文管理器使用时，所有请求共用一个长期的 `aiohttp.ClientSession` ，复用与图书馆服务器的连接：
 
     ```python
-    from concurrent.futures import ThreadPoolExecutor
-    with ThreadPoolExecutor(max_workers = 4) as executor:
+    async with Session() as session:
+        paper_infos = await session.async_paper_informations(teacher_infos)
+        print(session.connection_stats())
+    ```
+
+4. 筛选论文数据时，在线程池或进程池中打分，使不同老师的打分与网络请求并发进行：
+
+    ```python
+    from src.text_relevance.executor import create_executor
+    with create_executor("process", max_workers = 4) as executor:
         session = Session(executor = executor)
         ...same as the code above
     ```
 
+5. 按完成顺序逐个取得结果，输入可以是（异步）迭代器，按需读取，但须按姓名排序：
+
+    ```python
+    async with Session() as session:
+        async for (teacher_info, paper_infos) in session.aiter_paper_informations(sorted(teacher_infos, key = lambda info: info["name"])):
+            ...
+    ```
+
 本模块的耗时操作在于 Session._filter_articles() ，而非网络请求。
 """
 
+from __future__ import annotations
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-import random
-from typing import Any, Dict, Iterable, List, Tuple
+from concurrent.futures import Executor
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Set, Tuple, TypeVar
 from types import NoneType
 import warnings
 
-from config.constants import CONCURRENCY_NUMBER, RETRANSMISSION, MAX_WORKERS
+import aiohttp
+
+from config.constants import PAGE_SIZE, FIRST_PAGE_SIZE, PIPELINE_WINDOW, BREAKER_MAX_PASSES
 from .hosted.fudan_primo.primo_library.libweb.webservices import (
-    guestJwt,
-    async_guestJwt,
     pnxs,
-    async_pnxs,
+    async_pnxs_page,
+    page_slices,
 )
+from src.text_relevance import score_matrix
+from utils.aiohttp import ConnectionStats, create_client_session
+from utils.breaker import get_breaker, gather_with_deferral
+from utils.checkpoint import Checkpoint
+from utils.deadline import expired, hedged, remaining
+from utils.jsonl import JsonlWriter
+from utils.limiter import get_limiter
+from utils.retry import classify, default_policy
+from errors import CircuitOpenError, UnauthorizedError
 from .document import Document
+from .pipeline import PaperPipeline, assign_articles, assembly_data
+from .token_manager import TokenManager
 from .__init__ import VALID_INSTITUTIONS
+from .hosted.fudan_primo import domain
 
 
-CONCURRENCY_NUMBER = max(MAX_WORKERS, 20)
+T = TypeVar("T")
 
 
 class Session():
     """
-    复用同一个 jwtToken ，减少重复获取 jwtToken 的开销。
+    复用同一个 jwtToken ，减少重复获取 jwtToken 的开销。jwtToken 由 `TokenManager` 管理，过期前自动刷新。
     """
 
     def __init__(
@@ -60,8 +89,11 @@ class Session():
         *,
         jwt_token   : str = None,
         limit       : int = 10,
+        page_size   : int = PAGE_SIZE,
+        first_page_size : int = FIRST_PAGE_SIZE,
+        adaptive    : bool = True,
         institution : str = "fdu",
-        executor    : ThreadPoolExecutor = None,
+        executor    : Executor = None,
         **kwargs    : Dict[str, Any]
     ):
         """
@@ -71,6 +103,9 @@ class Session():
 
         - `jwt_token`: 可选的初始 jwtToken。
         - `limit`    : 默认的最大查询结果条目数。
+        - `page_size`: 每页的查询结果条目数。`limit` 超过此值时分页并发查询。
+        - `first_page_size`: 自适应查询时第一页的查询结果条目数。
+        - `adaptive` : 异步查询时是否自适应地决定查询多少条结果，见 async_search_homonym_articles() 。
         - `institution`: 默认的
         """
         if not isinstance(jwt_token, (str, NoneType)):
@@ -83,25 +118,74 @@ class Session():
         if limit == 0:
             warnings.warn(f"`limit` is expected to be a positive integer, but got {limit!r}", UserWarning)
 
+        if not isinstance(page_size, int):
+            raise TypeError(f"`page_size` is expected to be `int` object, but got `{page_size!r}`")
+        if page_size <= 0:
+            raise ValueError(f"`page_size` is expected to be a positive integer, but got {page_size!r}")
+
+        if not isinstance(first_page_size, int):
+            raise TypeError(f"`first_page_size` is expected to be `int` object, but got `{first_page_size!r}`")
+        if first_page_size <= 0:
+            raise ValueError(f"`first_page_size` is expected to be a positive integer, but got {first_page_size!r}")
+
         if not isinstance(institution, str):
             raise TypeError(f"`institution` is expected to be `str` object, but got `{institution!r}`")
         if institution.lower() not in VALID_INSTITUTIONS:
             raise ValueError(f"`institution` is expected to be in {VALID_INSTITUTIONS}, but got {institution!r}")
 
-        if not isinstance(executor, (ThreadPoolExecutor, NoneType)):
-            raise TypeError(f"`executor` is expected to be `ThreadPoolExecutor` object, but got `{executor!r}`")
+        if not isinstance(executor, (Executor, NoneType)):
+            raise TypeError(f"`executor` is expected to be `Executor` object, but got `{executor!r}`")
 
         self.limit = limit
+        self.page_size = page_size
+        self.first_page_size = first_page_size
+        self.adaptive = adaptive
         self.institution = institution
 
         self.default_kwargs = kwargs
 
-        self.jwt_token = jwt_token or ""
-        if not self.jwt_token:
-            self.update_token(**kwargs)
+        # 不在此处同步地获取 jwtToken ，而是在首次使用时获取（或从 JWT_TOKEN_PATH 中复用）
+        self.tokens = TokenManager(institution, jwt_token, **kwargs)
 
         self.executor = executor
 
+        # 由 `async with` 创建并关闭，见 __aenter__()
+        self.client: aiohttp.ClientSession | None = None
+        self._connection_stats = ConnectionStats()
+
+
+    async def __aenter__(self) -> Session:
+        """
+        创建所有异步请求共用的 `aiohttp.ClientSession` ，并在后台定时刷新 jwtToken 。
+        """
+        self.client = create_client_session(self._connection_stats)
+        self.tokens.client = self.client
+        self.tokens.start()
+        return self
+
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.tokens.stop()
+        self.tokens.client = None
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+
+    @property
+    def jwt_token(self) -> str:
+        """
+        有效的 jwtToken 。若即将过期，则同步地刷新。
+        """
+        return self.tokens.get_sync()
+
+
+    def connection_stats(self) -> Dict[str, int | float]:
+        """
+        返回共用的 `aiohttp.ClientSession` 的连接复用情况，见 utils.aiohttp.ConnectionStats.to_json() 。
+        """
+        return self._connection_stats.to_json()
+
 
     def update_token(self, **kwargs: Dict[str, Any]) -> None:
         """
@@ -111,41 +195,50 @@ class Session():
 
         - `kwargs`: 传递给 guestJwt() 的参数。
         """
-        arguments = {"institution": self.institution} | self.default_kwargs | kwargs
-        self.jwt_token = guestJwt(**arguments)
+        self.tokens.refresh_sync(**kwargs)
 
 
     async def async_update_token(self, **kwargs: Dict[str, Any]) -> None:
         """
-        获取一个新的 jwtToken。
+        获取一个新的 jwtToken。同时发起的多次刷新只会发送一次请求。
 
         Params:
 
-        - `kwargs`: 传递给 guestJwt() 的参数。
+        - `kwargs`: 传递给 async_guestJwt() 的参数。
         """
-        arguments = {"institution": self.institution} | self.default_kwargs | kwargs
-        self.jwt_token = await async_guestJwt(**arguments)
+        await self.tokens.refresh(**kwargs)
 
 
-    def _filter_articles(self, teacher_info: Dict[str, str], pnxs: Iterable[Dict[str, Any]]) -> List[Document]:
+    def _prepare_articles(self, teacher_infos: List[Dict[str, str]], pnxs: Iterable[Dict[str, Any]]) -> Tuple[List[Document], List[str], List[str]]:
         """
-        筛选出可能是该老师写的论文。
+        解析查询结果，返回作者中包含这些同名老师的文章，以及打分所需的查询文本（各老师的研究方向）和候选文本（各文章的描述）。
         """
-        # 筛选出类型为“article”（文章）的文献
-        all_articles: List[Document] = [
-            document
-            for document in map(Document.from_pnx, pnxs)
-            if document.type == "article"
+        name = teacher_infos[0]["name"]
+        # 直接在 pnx 上筛选出类型为“article”（文章）且作者中包含该老师的文献，再构造 `Document` 对象
+        pnxs = list(pnxs)
+        candidates: List[Document] = [
+            Document.from_pnx(pnx)
+            for pnx in pnxs
+            if Document.pnx_matches(pnx, name)
         ]
+        if pnxs:
+            rejected = len(pnxs) - len(candidates)
+            print(f"{name} 老师的 {len(pnxs)} 条查询结果中，{rejected} 条（{rejected / len(pnxs):.0%}）在预筛选中被排除。")
+        queries = [teacher_info["subject"] for teacher_info in teacher_infos]
+        texts = [article._get_comparable_text() for article in candidates]
+        return (candidates, queries, texts)
+
 
-        # 多线程加速判断
+    def _filter_articles(self, teacher_infos: List[Dict[str, str]], pnxs: Iterable[Dict[str, Any]]) -> List[List[Document]]:
+        """
+        筛选出可能是这些同名老师写的论文，每篇论文至多分给其中一位老师。
+        """
+        (candidates, queries, texts) = self._prepare_articles(teacher_infos, pnxs)
         if self.executor:
-            is_by_teacher: Tuple[bool] = tuple(self.executor.map(Document.is_by_teacher, all_articles, [teacher_info] * len(all_articles)))
+            matrix = self.executor.submit(score_matrix, queries, texts).result()
         else:
-            print(False)
-            is_by_teacher: Tuple[bool] = tuple(article.is_by_teacher(teacher_info) for article in all_articles)
-
-        return [article for (idx, article) in enumerate(all_articles, start = 0) if is_by_teacher[idx]]
+            matrix = score_matrix(queries, texts)
+        return assign_articles(candidates, matrix)
 
 
     def search_articles(self, teacher_info: Dict[str, str], **kwargs: Dict[str, Any]) -> List[Document]:
@@ -154,13 +247,31 @@ class Session():
 
         同步方法。
         """
+        return self.search_homonym_articles([teacher_info], **kwargs)[0]
+
+
+    def search_homonym_articles(self, teacher_infos: List[Dict[str, str]], **kwargs: Dict[str, Any]) -> List[List[Document]]:
+        """
+        查询同名的几位老师的论文数据。只查询一次，每篇论文分给最相关的那位老师。
+
+        同步方法。
+
+        Return:
+
+        - 与 `teacher_infos` 一一对应的论文列表。
+        """
         arguments = {
-            "jwt_token": self.jwt_token,
-            "search_text": teacher_info["name"],
+            "search_text": teacher_infos[0]["name"],
             "limit": self.limit,
+            "page_size": self.page_size,
             "institution": self.institution,
         } | self.default_kwargs | kwargs
-        return self._filter_articles(teacher_info, pnxs(**arguments))
+        try:
+            pnx_infos = pnxs(jwt_token = self.jwt_token, **arguments)
+        except UnauthorizedError:
+            # jwtToken 在有效期内被拒绝，刷新后重发一次
+            pnx_infos = pnxs(jwt_token = self.tokens.refresh_sync(), **arguments)
+        return self._filter_articles(teacher_infos, pnx_infos)
 
 
     async def async_search_articles(self, teacher_info: Dict[str, str], **kwargs: Dict[str, Any]) -> List[Document]:
@@ -169,25 +280,138 @@ class Session():
 
         异步方法。
         """
-        arguments = {
-            "jwt_token": self.jwt_token,
-            "search_text": teacher_info["name"],
-            "limit": self.limit,
+        return (await self.async_search_homonym_articles([teacher_info], **kwargs))[0]
+
+
+    async def _async_call_with_token(self, fetch, **arguments: Dict[str, Any]):
+        """
+        带上有效的 jwtToken 调用 `fetch(**arguments)` 。若服务器返回 401 ，则刷新 jwtToken 并重发一次。
+
+        每次请求都要经过图书馆主机的熔断器，并在其自适应并发限制器中占用一个空位。
+
+        Raise:
+
+        - `CircuitOpenError` ：图书馆主机已被熔断。
+        """
+        token = await self.tokens.get()
+        try:
+            async with get_breaker(domain).guard(), get_limiter(domain).slot():
+                return await fetch(jwt_token = token, session = self.client, **arguments)
+        except UnauthorizedError:
+            token = await self.tokens.refresh(stale = token)
+            async with get_breaker(domain).guard(), get_limiter(domain).slot():
+                return await fetch(jwt_token = token, session = self.client, **arguments)
+
+
+    async def _async_fetch(self, name: str, fetch, **arguments: Dict[str, Any]):
+        """
+        调用 `fetch(**arguments)` 查询 `name` 老师的论文数据，失败时按 `utils.retry.default_policy` 重试。
+        超过图书馆主机的 p95 延迟仍未返回时，发出对冲请求，见 `utils.deadline.hedged()` 。
+
+        Return:
+
+        - `fetch` 的返回值。若最终失败，则返回 `None` 。
+
+        Raise:
+
+        - `CircuitOpenError` ：图书馆主机已被熔断。由 async_paper_informations() 推迟到之后一轮处理。
+        """
+        try:
+            return await default_policy.call(hedged, domain, self._async_call_with_token, fetch, host = domain, description = f"解析 {name} 老师的论文数据", **arguments)
+        except CircuitOpenError:
+            raise
+        except Exception as error:
+            print(f"放弃解析 {name} 老师的论文数据（{classify(error)}）: {str(error)[:50]}")
+            return None
+
+
+    async def _async_fetch_pages(self, name: str, limit: int, page_size: int, **arguments: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], bool] | None:
+        """
+        分页查询 `name` 老师的至多 `limit` 条论文数据：先查询第一页得到结果总数，再并发查询其余各页。
+
+        与 async_pnxs() 不同，每一页都是单独的 _async_fetch() 调用，各自在限制器中占用空位、经过熔断器，失败时单独重试。
+
+        Return:
+
+        - `(按相关度排序的查询结果, 是否所有页都成功)` 。若第一页最终失败，则返回 `None` 。
+
+        Raise:
+
+        - `CircuitOpenError` ：图书馆主机已被熔断。
+        """
+        first = await self._async_fetch(name, async_pnxs_page, **(arguments | {"limit": min(limit, page_size), "offset": 0}))
+        if first is None:
+            return None
+        (results, total) = first
+        pages = await asyncio.gather(*(
+            self._async_fetch(name, async_pnxs_page, **(arguments | {"limit": size, "offset": offset}))
+            for (offset, size) in page_slices(limit, page_size, total)
+        ))
+        # asyncio.gather() 按提交顺序返回，合并后仍按相关度排序
+        for page in pages:
+            if page is not None:
+                results.extend(page[0])
+        return (results, None not in pages)
+
+
+    def _search_arguments(self, name: str, **kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        返回异步查询 `name` 老师的论文时传给 async_pnxs_page() 的参数（不含 `limit` 等分页参数）。
+        """
+        return {
+            "search_text": name,
             "institution": self.institution,
         } | self.default_kwargs | kwargs
-        transmissions = 1
-        pnx_infos = []
-        parsing_successful = False
-        while (not parsing_successful) and (transmissions <= RETRANSMISSION):
-            await asyncio.sleep(random.random())
-            try:
-                pnx_infos = await async_pnxs(**arguments)
-                parsing_successful = True
-            except (Exception, ConnectionResetError) as error:
-                print(f"解析 {teacher_info['person_id']},{teacher_info['name']} 老师的论文数据时发生 {transmissions} 次错误: {str(error)[:50]}")
-                await asyncio.sleep(1)
-            transmissions += 1
-        return self._filter_articles(teacher_info, pnx_infos)
+
+
+    def _next_page_size(self, offset: int, size: int, total: int, returned: int, accepted: int) -> Tuple[int, str]:
+        """
+        自适应查询时，根据刚查询的一页决定下一页的大小。
+
+        Params:
+
+        - `offset`  : 下一页的起始位置。
+        - `size`    : 刚查询的一页的大小。
+        - `total`   : 结果总数。
+        - `returned`: 刚查询的一页实际返回的条目数。
+        - `accepted`: 刚查询的一页中被接受的论文数。
+
+        Return:
+
+        - `(下一页的大小, "")` ，或 `(0, 停止原因)` 。
+        """
+        if (not returned) or (offset >= total):
+            return (0, f"已取完全部 {total} 条结果")
+        if offset >= self.limit:
+            return (0, f"达到上限 {self.limit} 条")
+        if accepted == 0:
+            return (0, "本页没有被接受的论文")
+        return (min(size * 2, self.page_size, self.limit - offset), "")
+
+
+    async def async_search_homonym_articles(self, teacher_infos: List[Dict[str, str]], **kwargs: Dict[str, Any]) -> List[List[Document]]:
+        """
+        查询同名的几位老师的论文数据。只查询一次，每篇论文分给最相关的那位老师。
+
+        若 `self.adaptive` 为 `True` ，则先查询 `self.first_page_size` 条结果，筛选后再决定是否查询下一页：
+
+        - 若本页没有被接受的论文，则停止，后面的结果按相关度排序，更不可能属于该老师；
+        - 否则查询下一页，页大小翻倍，但不超过 `self.page_size` ；
+        - 直到取完所有结果，或达到 `self.limit` 条。
+
+        否则一次查询 `self.limit` 条结果（分页并发查询）。
+
+        查询过程与 async_paper_informations() 相同，在一个只容纳这一组老师的流水线中进行，见 `exlibrisgroup.pipeline.PaperPipeline` 。
+
+        异步方法。
+
+        Return:
+
+        - 与 `teacher_infos` 一一对应的论文列表。
+        """
+        async with PaperPipeline(self, window = 1, score_workers = 1, **kwargs) as pipeline:
+            (assigned, _) = await pipeline.search(teacher_infos)
+        return assigned
 
 
     def paper_information(self, teacher_info: Dict[str, str], **kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
@@ -197,7 +421,7 @@ class Session():
         获取指定老师的论文信息。
         """
         return [
-            _assembly_data(teacher_info, article)
+            assembly_data(teacher_info, article)
             for article in self.search_articles(teacher_info, **kwargs)
         ]
 
@@ -209,20 +433,46 @@ class Session():
         获取指定老师的论文信息。
         """
         return [
-            _assembly_data(teacher_info, article)
+            assembly_data(teacher_info, article)
             for article in await self.async_search_articles(teacher_info, **kwargs)
         ]
 
 
+    def homonym_paper_information(self, teacher_infos: List[Dict[str, str]], **kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        同步函数。
+
+        获取同名的几位老师的论文信息。
+        """
+        return [
+            assembly_data(teacher_info, article)
+            for (teacher_info, articles) in zip(teacher_infos, self.search_homonym_articles(teacher_infos, **kwargs))
+            for article in articles
+        ]
+
+
+    async def async_homonym_paper_information(self, teacher_infos: List[Dict[str, str]], **kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        异步函数。
+
+        获取同名的几位老师的论文信息。
+        """
+        return [
+            assembly_data(teacher_info, article)
+            for (teacher_info, articles) in zip(teacher_infos, await self.async_search_homonym_articles(teacher_infos, **kwargs))
+            for article in articles
+        ]
+
+
     def paper_informations(self, teacher_infos: Iterable[Dict[str, str]], **kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
         """
         同步函数。
 
-        获取所有老师的论文信息。
+        获取所有老师的论文信息。同名的老师只查询一次。
         """
         paper_infos: List[Dict[str, str]] = []
-        for teacher_info in teacher_infos:
-            paper_infos.extend(self.paper_information(teacher_info, **kwargs))
+        for homonyms in _group_by_name(teacher_infos):
+            paper_infos.extend(self.homonym_paper_information(homonyms, **kwargs))
         return paper_infos
 
 
@@ -230,31 +480,193 @@ class Session():
         """
         异步函数，异步并发加速。
 
-        获取所有老师的论文信息。
+        获取所有老师的论文信息。同名的老师只查询一次。
+
+        查询、解析、打分和输出在流水线中分阶段并发进行，见 `exlibrisgroup.pipeline.PaperPipeline` 。
+        图书馆主机被熔断时，未完成的老师被推迟到熔断器可以探测后再查询，见 `utils.breaker.gather_with_deferral()` 。
         """
-        paper_infos: List[Dict[str, str]] = []
-        semaphore = asyncio.Semaphore(CONCURRENCY_NUMBER)
+        groups = _group_by_name(teacher_infos)
+        async def collect(homonyms: List[Dict[str, str]], paper_infos: List[List[Dict[str, str]]], complete: bool) -> List[Dict[str, str]]:
+            return [paper_info for teacher_paper_infos in paper_infos for paper_info in teacher_paper_infos]
 
-        async def fetch_info(teacher_info: Dict[str, str], **kwargs: Dict[str, Any]) -> None:
-            async with semaphore:
-                print(f"开始爬取 {teacher_info["name"]} 老师的论文数据。")
-                paper_infos.extend(await self.async_paper_information(teacher_info, **kwargs))
+        results = await self._async_each_paper_information(groups, collect, **kwargs)
+        return [paper_info for paper_infos in results for paper_info in paper_infos]
 
-        tasks = [fetch_info(teacher_info, **kwargs) for teacher_info in teacher_infos]
-        await asyncio.gather(*tasks)
-        return paper_infos
 
+    async def async_write_paper_informations(self, teacher_infos: Iterable[Dict[str, str]], path: str, checkpoint: Checkpoint = None, **kwargs: Dict[str, Any]) -> int:
+        """
+        异步函数，异步并发加速。
+
+        获取所有老师的论文信息，每组同名老师完成后立即写入 JSON Lines 文件 `path` ，不在内存中累积。
+        写入过程中使用临时文件，全部完成后才原子地替换 `path` ，见 `utils.jsonl.JsonlWriter` 。
+        到阶段截止时间（见 `utils.deadline`）时结果不完整，不替换 `path` ，已写出的部分留在临时文件中。
+
+        Params:
+
+        - `checkpoint`: 若提供，则跳过其中已完成的同名老师（直接写入记录的论文信息），并记录新完成的。
+          请求用尽重试次数的老师不会被记录，续爬时重新查询。
+
+        Return:
+
+        - 写入的论文信息条数。
+        """
+        groups = _group_by_name(teacher_infos)
+        with JsonlWriter(path) as writer:
+            count = 0
+            if checkpoint is not None:
+                finished = [homonyms for homonyms in groups if checkpoint.has_teachers(_teacher_keys(homonyms))]
+                groups = [homonyms for homonyms in groups if not checkpoint.has_teachers(_teacher_keys(homonyms))]
+                for paper_info in checkpoint.iter_rows({key for homonyms in finished for key in _teacher_keys(homonyms)}):
+                    await writer.async_write(paper_info)
+                    count += 1
+                print(f"跳过已完成的 {len(finished)} 组同名老师（{count} 条论文信息），剩余 {len(groups)} 组。")
+
+            async def write(homonyms: List[Dict[str, str]], paper_infos: List[List[Dict[str, str]]], complete: bool) -> int:
+                for teacher_paper_infos in paper_infos:
+                    await writer.async_write_many(teacher_paper_infos)
+                if (checkpoint is not None) and complete:
+                    checkpoint.record_teachers(_teacher_keys(homonyms), paper_infos)
+                return sum(map(len, paper_infos))
+
+            count += sum(await self._async_each_paper_information(groups, write, **kwargs))
+            if expired():
+                print(f"已到截止时间，结果不完整，不替换 {path} 。已完成的老师保留在检查点日志中，可用 --resume 继续。")
+                writer.close(commit = False)
+        return count
+
+
+    async def aiter_paper_informations(self, teacher_infos: Iterable[Dict[str, str]] | AsyncIterable[Dict[str, str]], window: int = PIPELINE_WINDOW, **kwargs: Dict[str, Any]) -> AsyncIterator[Tuple[Dict[str, str], List[Dict[str, str]]]]:
+        """
+        异步生成器。按完成顺序逐个产出 `(teacher_info, 该老师的论文信息)` 。
+
+        - `teacher_infos` 可以是普通的或异步的可迭代对象，按需读取，不会一次性读完，但必须已按姓名排序，
+          使同名的老师相邻、被分为一组并只查询一次（如 `sorted(teacher_infos, key = lambda info: info["name"])`）；
+        - 同时处理的同名老师组数不超过 `window` ，内存占用与老师总数无关；
+        - 图书馆主机被熔断时，该组等到熔断器可以探测后再查询，最多 `BREAKER_MAX_PASSES` 次；
+        - 到阶段截止时间（见 `utils.deadline`）时，不再读取新的老师，并取消未完成的。
+
+        Params:
+
+        - `window`: 同时处理的同名老师组数，也是流水线的容量。
+        - `kwargs`: 其他传递给 async_pnxs_page() 的参数。
+
+        Raise:
+
+        - `ValueError`: `teacher_infos` 没有按姓名排序。此前已产出的结果仍然有效。
+        """
+        async def fetch_info(homonyms: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], List[List[Dict[str, str]]]]:
+            for attempt in range(1, BREAKER_MAX_PASSES + 1):
+                try:
+                    (paper_infos, _) = await pipeline.submit(homonyms)
+                    return (homonyms, paper_infos)
+                except CircuitOpenError as error:
+                    if attempt == BREAKER_MAX_PASSES:
+                        print(f"图书馆仍被熔断，放弃 {homonyms[0]['name']} 老师的论文数据。")
+                        return (homonyms, [[] for _ in homonyms])
+                    await asyncio.sleep(error.retry_after)
+
+        groups = _group_adjacent(_aiter(teacher_infos)).__aiter__()
+        tasks: Set[asyncio.Task] = set()
+        exhausted = False
+        async with PaperPipeline(self, window = window, **kwargs) as pipeline:
+            try:
+                while True:
+                    # 补充到 `window` 个任务
+                    while (not exhausted) and (len(tasks) < window) and (remaining() != 0):
+                        try:
+                            homonyms = await groups.__anext__()
+                        except StopAsyncIteration:
+                            exhausted = True
+                            break
+                        tasks.add(asyncio.create_task(fetch_info(homonyms)))
+                    if not tasks:
+                        break
+                    (done, tasks) = await asyncio.wait(tasks, timeout = remaining(), return_when = asyncio.FIRST_COMPLETED)
+                    if not done:
+                        print(f"已到截止时间，放弃 {len(tasks)} 组未完成的同名老师。")
+                        break
+                    for task in done:
+                        (homonyms, paper_infos) = task.result()
+                        for (teacher_info, teacher_paper_infos) in zip(homonyms, paper_infos):
+                            yield (teacher_info, teacher_paper_infos)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions = True)
+
+
+    async def _async_each_paper_information(self, groups: List[List[Dict[str, str]]], consume: Callable[[List[Dict[str, str]], List[List[Dict[str, str]]], bool], Awaitable[T]], **kwargs: Dict[str, Any]) -> List[T]:
+        """
+        在流水线中获取每组同名老师的论文信息，每组完成后调用 `await consume(homonyms, paper_infos, complete)` ，
+        其中 `paper_infos` 与 `homonyms` 一一对应，见 PaperPipeline.submit() 。
+
+        Return:
+
+        - 各组的 `consume()` 的返回值。
+        """
+        # 并发的请求数由图书馆主机的自适应并发限制器控制，见 _async_call_with_token()
+        async with PaperPipeline(self, **kwargs) as pipeline:
+            async def fetch_info(homonyms: List[Dict[str, str]]) -> T:
+                return await consume(homonyms, *await pipeline.submit(homonyms))
+
+            results = await gather_with_deferral(domain, fetch_info, groups)
+            print(f"流水线各队列的最大深度：{pipeline.max_depths}")
+        return results
 
 
-def _assembly_data(teacher_info: Dict[str, str], article: Document) -> Dict[str, str]:
-    return {
-        "person_id": teacher_info["person_id"],
-        "author_cn": teacher_info["name"],
-        "author_en": "",
-        "author_email": teacher_info["email"],
-        "title_cn": article.title_cn,
-        "title_en": article.title_en,
-        "keyword_cn": "；".join(article.subject_cn),
-        "keyword_en": "；".join(article.subject_en),
-        "article_info": f"{article.title_cn} {article.title_en} {article.description_cn} {article.description_en}",
-    }
+
+async def _aiter(items: Iterable[T] | AsyncIterable[T]) -> AsyncIterator[T]:
+    """
+    把普通的或异步的可迭代对象统一为异步迭代器。
+    """
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def _group_adjacent(teacher_infos: AsyncIterator[Dict[str, str]]) -> AsyncIterator[List[Dict[str, str]]]:
+    """
+    把按姓名排序的老师中相邻的同名老师分为一组，逐组产出。
+
+    Raise:
+
+    - `ValueError`: 老师没有按姓名排序。否则已产出的某个姓名可能再次出现，同名的老师会被拆成两组分别分配论文。
+    """
+    group: List[Dict[str, str]] = []
+    async for teacher_info in teacher_infos:
+        if group and (teacher_info["name"] < group[0]["name"]):
+            raise ValueError(f"`teacher_infos` is expected to be sorted by name, but got {teacher_info['name']!r} after {group[0]['name']!r}")
+        if group and (teacher_info["name"] != group[0]["name"]):
+            yield group
+            group = []
+        group.append(teacher_info)
+    if group:
+        yield group
+
+
+def _teacher_key(teacher_info: Dict[str, str]) -> str:
+    """
+    老师在检查点日志中的键：`"学院/person_id"` 。
+
+    `person_id` 只在各学院的网站内唯一，不同学院的老师可能有相同的 `person_id` ，因此键中包含学院。
+    缺少 `person_id` 的老师以姓名代替，使他们不会与其他缺少 `person_id` 的老师共用一个键。
+    """
+    person_id = teacher_info.get("person_id") or f"name:{teacher_info['name']}"
+    return f"{teacher_info.get('college', '')}/{person_id}"
+
+
+def _teacher_keys(teacher_infos: List[Dict[str, str]]) -> List[str]:
+    return [_teacher_key(teacher_info) for teacher_info in teacher_infos]
+
+
+def _group_by_name(teacher_infos: Iterable[Dict[str, str]]) -> List[List[Dict[str, str]]]:
+    """
+    把同名的老师分为一组，保持首次出现的顺序。
+    """
+    groups: Dict[str, List[Dict[str, str]]] = {}
+    for teacher_info in teacher_infos:
+        groups.setdefault(teacher_info["name"], []).append(teacher_info)
+    return list(groups.values())
@@ -0,0 +1,229 @@
+"""
+管理访问图书馆接口所需的 jwtToken 。
+
+- 从 JWT 的载荷中读出过期时间 `exp` ，在过期前 `TOKEN_REFRESH_MARGIN` 秒主动刷新。
+- 同时发起的多次刷新合并为一次请求。
+- 后台刷新连续失败时按指数退避等待后再试（基数与上限同 `utils.retry.default_policy`），不会在接口宕机时频繁请求。
+- 有效的 jwtToken 保存到 `JWT_TOKEN_PATH` ，短时间内再次运行时无需重新获取。
+"""
+
+from __future__ import annotations
+import asyncio
+import base64
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict
+
+import aiohttp
+
+from config.constants import JWT_TOKEN_PATH, TOKEN_REFRESH_MARGIN, FILE_ENCODING
+from utils.retry import classify, default_policy
+from .hosted.fudan_primo.primo_library.libweb.webservices import guestJwt, async_guestJwt
+
+
+def decode_exp(token: str) -> float | None:
+    """
+    读出 JWT 的过期时间（Unix 时间戳）。若无法解析，则返回 `None` 。
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4) # base64url 去掉了末尾的填充
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, ValueError, KeyError, TypeError):
+        return None
+
+
+class TokenManager():
+    """
+    jwtToken 的管理器。
+
+    Usage:
+
+    ```python
+    tokens = TokenManager("fdu")
+    token = await tokens.get()                 # 若即将过期，则先刷新
+    token = await tokens.refresh(stale = token) # 收到 401 后刷新；若其他协程已经刷新过，则直接返回新的 jwtToken
+    ```
+    """
+
+    def __init__(self, institution: str, token: str = None, **kwargs: Dict[str, Any]):
+        """
+        Params:
+
+        - `institution`: 发起请求者的身份，如 `"fdu"` 。
+        - `token`      : 可选的初始 jwtToken 。若为 `None` ，则尝试从 `JWT_TOKEN_PATH` 中读取。
+        - `kwargs`     : 传递给 guestJwt() 的其他参数。
+        """
+        self.institution = institution
+        self.default_kwargs = kwargs
+
+        # 刷新时使用的 `aiohttp.ClientSession` ，由 `exlibrisgroup.spider.Session` 设置
+        self.client: aiohttp.ClientSession | None = None
+
+        self._token = ""
+        self._exp: float | None = None
+        self._lock = threading.Lock()
+        self._refreshing: asyncio.Future | None = None
+        self._background: asyncio.Task | None = None
+
+        if token:
+            self._set(token, persist = False)
+        else:
+            self._load()
+
+
+    @property
+    def token(self) -> str:
+        """
+        当前的 jwtToken ，可能已过期。
+        """
+        return self._token
+
+
+    def is_valid(self) -> bool:
+        """
+        当前的 jwtToken 是否存在，且距离过期还有 `TOKEN_REFRESH_MARGIN` 秒以上。无法读出过期时间的 jwtToken 视为有效。
+        """
+        if not self._token:
+            return False
+        return (self._exp is None) or (time.time() < self._exp - TOKEN_REFRESH_MARGIN)
+
+
+    def _set(self, token: str, persist: bool = True) -> None:
+        self._token = token
+        self._exp = decode_exp(token)
+        if persist and (self._exp is not None):
+            self._save()
+
+
+    def _load(self) -> None:
+        """
+        从 `JWT_TOKEN_PATH` 中读取仍然有效的 jwtToken 。
+        """
+        try:
+            with open(JWT_TOKEN_PATH, mode = "r", encoding = FILE_ENCODING) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("institution") == self.institution.lower():
+            self._set(data.get("token", ""), persist = False)
+            if not self.is_valid():
+                self._token = ""
+                self._exp = None
+
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(JWT_TOKEN_PATH) or ".", exist_ok = True)
+        temp_path = f"{JWT_TOKEN_PATH}.{os.getpid()}.tmp"
+        with open(temp_path, mode = "w", encoding = FILE_ENCODING) as file:
+            json.dump({"institution": self.institution.lower(), "token": self._token, "exp": self._exp}, file)
+        os.replace(temp_path, JWT_TOKEN_PATH)
+
+
+    def get_sync(self) -> str:
+        """
+        返回有效的 jwtToken 。若即将过期，则先用 guestJwt() 刷新。
+
+        同步方法。
+        """
+        with self._lock:
+            if not self.is_valid():
+                self.refresh_sync()
+            return self._token
+
+
+    def refresh_sync(self, **kwargs: Dict[str, Any]) -> str:
+        """
+        用 guestJwt() 获取一个新的 jwtToken 。
+
+        同步方法。
+
+        Params:
+
+        - `kwargs`: 传递给 guestJwt() 的参数。
+        """
+        arguments = {"institution": self.institution} | self.default_kwargs | kwargs
+        self._set(guestJwt(**arguments))
+        return self._token
+
+
+    async def get(self) -> str:
+        """
+        返回有效的 jwtToken 。若即将过期，则先刷新。
+
+        异步方法。
+        """
+        if self.is_valid():
+            return self._token
+        return await self.refresh(stale = self._token)
+
+
+    async def refresh(self, stale: str = None, **kwargs: Dict[str, Any]) -> str:
+        """
+        获取一个新的 jwtToken 。同时发起的多次刷新只会发送一次请求。
+
+        异步方法。
+
+        Params:
+
+        - `stale` : 调用者认为已失效的 jwtToken 。若当前的 jwtToken 已不是它且仍然有效，说明已被刷新过，直接返回。
+        - `kwargs`: 传递给 async_guestJwt() 的参数。
+        """
+        if (stale is not None) and (stale != self._token) and self.is_valid():
+            return self._token
+        if self._refreshing is None:
+            arguments = {"institution": self.institution} | self.default_kwargs | kwargs
+            self._refreshing = asyncio.ensure_future(self._fetch(**arguments))
+        # 某个等待者被取消时，不取消共享的刷新请求
+        return await asyncio.shield(self._refreshing)
+
+
+    async def _fetch(self, **arguments: Dict[str, Any]) -> str:
+        try:
+            self._set(await async_guestJwt(session = self.client, **arguments))
+            return self._token
+        finally:
+            self._refreshing = None
+
+
+    def start(self) -> None:
+        """
+        在后台定时刷新：在 jwtToken 过期前 `TOKEN_REFRESH_MARGIN` 秒主动刷新。必须在事件循环中调用。
+        """
+        if self._background is None:
+            self._background = asyncio.create_task(self._refresh_periodically())
+
+
+    async def stop(self) -> None:
+        """
+        停止后台刷新。
+        """
+        if self._background is not None:
+            self._background.cancel()
+            try:
+                await self._background
+            except asyncio.CancelledError:
+                pass
+            self._background = None
+
+
+    async def _refresh_periodically(self) -> None:
+        failures = 0 # 连续失败的次数
+        while True:
+            if self._token and (self._exp is None):
+                return # 无法得知过期时间，只能在收到 401 时刷新
+            delay = (self._exp - TOKEN_REFRESH_MARGIN - time.time()) if self._exp else 0
+            await asyncio.sleep(max(delay, 0))
+            try:
+                await self.refresh(stale = self._token)
+                failures = 0
+            except Exception as error:
+                failures += 1
+                # 至少等待退避时间的一半，使接口持续不可用时请求间隔确实随失败次数增长
+                cap = min(default_policy.max_delay, default_policy.base_delay * 2 ** (failures - 1))
+                backoff = random.uniform(cap / 2, cap)
+                print(f"刷新 jwtToken 时发生第 {failures} 次错误（{classify(error)}），{backoff:.1f} 秒后重试: {str(error)[:50]}")
+                await asyncio.sleep(backoff)
@@ -0,0 +1,50 @@
+"""
+爬取各学院的老师的基本信息。各学院的模块见同名子包，汇总见 `fudan.spider` 。
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List
+
+from errors import CircuitOpenError
+from utils.breaker import get_breaker
+from utils.deadline import hedged
+from utils.limiter import get_limiter
+from utils.retry import classify, default_policy
+
+
+async def async_fetch_basic_info(domain: str, func: Callable[..., Awaitable[Dict[str, str]]], *args: Any, name: str, incomplete: List[str] = None) -> Dict[str, str]:
+    """
+    请求一位老师的详情页：`await func(*args)` 。
+
+    每次尝试单独经过主机 `domain` 的熔断器和限制器，失败时按 `default_policy` 重试，延迟超过 p95 时发出对冲请求。
+
+    Params:
+
+    - `domain`    : 详情页所在的主机。
+    - `func`      : 请求并解析详情页的协程函数，如 `async_list` 。
+    - `args`      : 传递给 `func` 的参数。
+    - `name`      : 老师的姓名，用于输出日志。
+    - `incomplete`: 若提供，则在用尽重试次数后仍失败时把 `name` 追加到其中，调用者据此判断学院的数据是否完整。
+
+    Return:
+
+    - `func` 的返回值。用尽重试次数后仍失败时，返回 `{}` ，该老师的基本信息只有列表页中的部分，而不是让整个学院失败。
+
+    Raise:
+
+    - `CircuitOpenError`: 主机已被熔断，由 `utils.breaker.gather_with_deferral()` 推迟处理。
+    """
+    async def fetch_once() -> Dict[str, str]:
+        # 每次请求单独占用一个空位，出错时限制器能及时减小并发数量
+        async with get_breaker(domain).guard(), get_limiter(domain).slot():
+            return await func(*args)
+
+    try:
+        # 详情页的延迟有长尾，超过 p95 仍未返回时发出对冲请求
+        return await default_policy.call(hedged, domain, fetch_once, host = domain, description = f"解析 {name} 老师的基本数据")
+    except CircuitOpenError:
+        raise
+    except Exception as error:
+        print(f"放弃解析 {name} 老师的基本数据（{classify(error)}）: {str(error)[:100]}")
+        if incomplete is not None:
+            incomplete.append(name)
+        return {}
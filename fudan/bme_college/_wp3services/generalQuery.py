@@ -6,6 +6,7 @@ import requests
 
 from errors import DataParseError
 from config.constants import COMMON_HEADERS
+from utils.aiohttp import CLIENT_TIMEOUT
 from ..__init__ import domain, base_url, site_id
 
 
@@ -77,7 +78,7 @@ async def async_generalQuery(**kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
     Return: 见 parse_data()
     """
     arguments = kwargs | _get_arguments()
-    async with aiohttp.ClientSession() as session:
+    async with aiohttp.ClientSession(timeout = CLIENT_TIMEOUT) as session:
         async with session.post(**arguments) as response:
             return parse_data(await response.text())
 
@@ -9,7 +9,6 @@ from ._wp3services import (
     generalQuery,
     async_generalQuery,
 )
-from config.constants import CONCURRENCY_NUMBER
 from .__init__ import college_name
 
 
@@ -40,18 +39,21 @@ def general_information(**kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
     return result
 
 
-async def async_general_information(**kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
+async def async_general_information(incomplete: List[str] = None, **kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
     """
     异步并发加速。
 
     获取智能机器人与先进制造创新学院的老师的基本信息。
+
+    Params:
+
+    - `incomplete`: 与其他学院的接口一致。不请求详情页，不会有不完整的老师。
     """
     general_infos: List[Dict[str, Any]] = await async_generalQuery(**kwargs)
     result: List[Dict[str, str]] = []
-    semaphore = asyncio.Semaphore(CONCURRENCY_NUMBER)
     async def fetch_info(general_info: Dict[str, Any]) -> Dict[str, str]:
-        async with semaphore:
-            return _assembly_data(general_info)
+        # 列表中已包含所需的全部信息，不再发送请求
+        return _assembly_data(general_info)
 
     tasks = [fetch_info(general_info) for general_info in general_infos]
     result = await asyncio.gather(*tasks)
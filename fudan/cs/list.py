@@ -9,6 +9,7 @@ import aiohttp
 
 from errors import DataParseError
 from config.constants import COMMON_HEADERS
+from utils.aiohttp import CLIENT_TIMEOUT
 from .__init__ import domain, base_url, site_id
 
 
@@ -77,8 +78,9 @@ async def async_list(teacher_or_url: str, **kwargs) -> Dict[str, str]:
     if "/" in teacher_or_url:
         # is url
         arguments["url"] = teacher_or_url
-    async with aiohttp.ClientSession() as session:
+    async with aiohttp.ClientSession(timeout = CLIENT_TIMEOUT) as session:
         async with session.get(**arguments) as response:
+            response.raise_for_status()
             text = await response.text()
             decoded_html = html.unescape(text)
             return parse_data(decoded_html)
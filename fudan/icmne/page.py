@@ -9,6 +9,7 @@ import requests
 from utils.bs4 import extract_strings
 from errors import DataParseError
 from config.constants import COMMON_HEADERS
+from utils.aiohttp import CLIENT_TIMEOUT
 from .__init__ import domain, base_url, site_id
 
 
@@ -65,8 +66,9 @@ async def async_page(url: str, **kwargs: Dict[str, Any]) -> Dict[str, str]:
     Return like: 见 parse_data()
     """
     arguments = kwargs | _get_arguments(url)
-    async with aiohttp.ClientSession() as session:
+    async with aiohttp.ClientSession(timeout = CLIENT_TIMEOUT) as session:
         async with session.get(**arguments) as response:
+            response.raise_for_status()
             return parse_data(await response.text())
 
 
@@ -2,7 +2,6 @@
 获取老师的数据。
 """
 
-import asyncio
 from typing import Any, Dict, List
 
 from .page import (
@@ -14,21 +13,22 @@ from ._wp3services import (
     generalQuery,
     async_generalQuery,
 )
-from config.constants import CONCURRENCY_NUMBER
-from .__init__ import college_name
+from fudan import async_fetch_basic_info
+from utils.breaker import gather_with_deferral
+from .__init__ import college_name, domain
 
 
 def _assembly_data(general_info: Dict[str, Any], basic_info: Dict[str, str]) -> Dict[str, str]:
     return {
-        "person_id"       : str(general_info["id"])             ,
-        "name"            : general_info["title"]               ,
-        "college"         : college_name                        ,
+        "person_id"       : str(general_info["id"])                     ,
+        "name"            : general_info["title"]                       ,
+        "college"         : college_name                                ,
         "academic_title"  : f"{general_info['f8']}、{general_info['f2']}".strip("、"),
-        "profile"         : basic_info["educational_background"],
-        "personal_website": basic_info["homepage"] if basic_info["homepage"] else general_info["url"],
-        "subject"         : basic_info["research_areas"]        ,
-        "email"           : basic_info["email"]                 ,
-        "phone"           : basic_info["phone"]                 ,
+        "profile"         : basic_info.get("educational_background", ""),
+        "personal_website": basic_info.get("homepage") or general_info["url"],
+        "subject"         : basic_info.get("research_areas", "")        ,
+        "email"           : basic_info.get("email", "")                 ,
+        "phone"           : basic_info.get("phone", "")                 ,
     }
 
 
@@ -46,20 +46,22 @@ def general_information(**kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
     return result
 
 
-async def async_general_information(**kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
+async def async_general_information(incomplete: List[str] = None, **kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
     """
     异步并发加速。
 
     获取集成电路与微纳电子创新学院的老师的基本信息。
+
+    Params:
+
+    - `incomplete`: 若提供，则把详情页用尽重试次数后仍失败的老师的姓名追加到其中。
     """
     general_infos: List[Dict[str, Any]] = await async_generalQuery(**kwargs)
     result: List[Dict[str, str]] = []
-    semaphore = asyncio.Semaphore(CONCURRENCY_NUMBER)
     async def fetch_info(general_info: Dict[str, Any]) -> Dict[str, str]:
-        async with semaphore:
-            basic_info = await async_page(general_info["url"])
-            return _assembly_data(general_info, basic_info)
+        basic_info = await async_fetch_basic_info(domain, async_page, general_info["url"], name = general_info["title"], incomplete = incomplete)
+        return _assembly_data(general_info, basic_info)
 
-    tasks = [fetch_info(general_info) for general_info in general_infos]
-    result = await asyncio.gather(*tasks)
+    # 主机被熔断时，未完成的老师被推迟到熔断器可以探测后再处理
+    result = await gather_with_deferral(domain, fetch_info, general_infos)
     return result
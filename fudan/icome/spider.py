@@ -1,4 +1,3 @@
-import asyncio
 from typing import Any, Dict, List
 
 from .list import (
@@ -9,8 +8,9 @@ from .page import (
     page,
     async_page,
 )
-from config.constants import CONCURRENCY_NUMBER
-from .__init__ import college_name
+from fudan import async_fetch_basic_info
+from utils.breaker import gather_with_deferral
+from .__init__ import college_name, domain
 
 
 def _assembly_data(general_info: Dict[str, Any], basic_info: Dict[str, str]) -> Dict[str, str]:
@@ -41,20 +41,22 @@ def general_information(**kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
     return result
 
 
-async def async_general_information(**kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
+async def async_general_information(incomplete: List[str] = None, **kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
     """
     异步并发加速。
 
     获取智能材料与未来能源创新学院的老师的基本信息。
+
+    Params:
+
+    - `incomplete`: 若提供，则把详情页用尽重试次数后仍失败的老师的姓名追加到其中。
     """
     general_infos: List[Dict[str, Any]] = await async_list(**kwargs)
     result: List[Dict[str, str]] = []
-    semaphore = asyncio.Semaphore(CONCURRENCY_NUMBER)
     async def fetch_info(general_info: Dict[str, Any]) -> Dict[str, str]:
-        async with semaphore:
-            basic_info = await async_page(general_info["path"])
-            return _assembly_data(general_info, basic_info)
+        basic_info = await async_fetch_basic_info(domain, async_page, general_info["path"], name = general_info["name"], incomplete = incomplete)
+        return _assembly_data(general_info, basic_info)
 
-    tasks = [fetch_info(general_info) for general_info in general_infos]
-    result = await asyncio.gather(*tasks)
+    # 主机被熔断时，未完成的老师被推迟到熔断器可以探测后再处理
+    result = await gather_with_deferral(domain, fetch_info, general_infos)
     return result
@@ -4,8 +4,6 @@
 之后可以搞 IP 池，预计可以减少一分钟的运行时间。
 """
 
-import asyncio
-import random
 from typing import Any, Dict, List
 
 from .Data import (
@@ -14,8 +12,9 @@ from .Data import (
     view,
     async_view,
 )
-from config.constants import CONCURRENCY_NUMBER, RETRANSMISSION
-from .__init__ import college_name
+from fudan import async_fetch_basic_info
+from utils.breaker import gather_with_deferral
+from .__init__ import college_name, domain
 
 # 3并发，耗时 135 秒，4 次错误，0/143 个失败。
 # 4并发，耗时 104 秒，1 次错误，0/143 个失败。
@@ -24,7 +23,7 @@ from .__init__ import college_name
 # 7并发，耗时 165 秒，29 次错误，0/143 个失败。
 # 8并发，耗时 173 秒，30 次错误，0/143 个失败。
 # 10并发，耗时 178 秒，63 次错误，0/143 个失败
-CONCURRENCY_NUMBER = 6
+# 以上是手动测得的结果。现在并发数量由 utils.limiter 中的自适应并发限制器调节：被反爬拦截（解析失败）时减半，顺利时逐步增加。
 
 
 def _assembly_data(general_info: Dict[str, Any], basic_info: Dict[str, str]) -> Dict[str, str]:
@@ -55,30 +54,22 @@ def general_information(**kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
     return result
 
 
-async def async_general_information(**kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
+async def async_general_information(incomplete: List[str] = None, **kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
     """
     异步并发加速。
 
     获取未来信息创新学院的老师的基本信息。
+
+    Params:
+
+    - `incomplete`: 若提供，则把详情页用尽重试次数后仍失败的老师的姓名追加到其中。
     """
     general_infos: List[Dict[str, Any]] = await async_query(**kwargs)
     result: List[Dict[str, str]] = []
-    semaphore = asyncio.Semaphore(CONCURRENCY_NUMBER)
     async def fetch_info(general_info: Dict[str, Any]) -> Dict[str, str]:
-        async with semaphore:
-            transmissions = 1
-            parsing_successful = False
-            basic_info = {}
-            while (not parsing_successful) and (transmissions <= RETRANSMISSION):
-                await asyncio.sleep(random.random())
-                try:
-                    basic_info = await async_view(general_info["path"])
-                    parsing_successful = True
-                except AttributeError as error:
-                    print(f"解析 {general_info['name']} 老师的基本数据时发生 {transmissions} 次错误: {str(error)[:100]}")
-                    await asyncio.sleep(1)
-                transmissions += 1
-            return _assembly_data(general_info, basic_info)
-    tasks = [fetch_info(general_info) for general_info in general_infos]
-    result = await asyncio.gather(*tasks)
+        # 被反爬拦截时解析失败，按 PARSE 重试，限制器同时减小并发数量
+        basic_info = await async_fetch_basic_info(domain, async_view, general_info["path"], name = general_info["name"], incomplete = incomplete)
+        return _assembly_data(general_info, basic_info)
+    # 主机被熔断时，未完成的老师被推迟到熔断器可以探测后再处理
+    result = await gather_with_deferral(domain, fetch_info, general_infos)
     return result
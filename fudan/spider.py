@@ -5,6 +5,8 @@ from typing import Any, Dict, List
 
 from config.constants import COLLEGES
 from src.deduplicate import is_same_person, merge_info
+from utils.breaker import get_breaker
+from utils.checkpoint import Checkpoint
 
 
 spiders = {
@@ -13,7 +15,15 @@ spiders = {
 }
 
 
-async def async_general_information(**kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
+async def async_general_information(checkpoint: Checkpoint = None, **kwargs: Dict[str, Any]) -> List[Dict[str, str]]:
+    """
+    获取所有学院的老师的基本信息，合并重复的人。
+
+    Params:
+
+    - `checkpoint`: 若提供，则跳过其中已完成的学院（直接使用记录的基本信息），并记录新完成的学院。
+      有老师因熔断或截止时间被放弃、或详情页用尽重试次数仍失败的学院不会被记录，续爬时重新爬取。
+    """
     name_mapping: Dict[str, List[Dict[str, str]]] = {}
 
     async def fetch_info(college: str, **kwargs: Dict[str, Any]) -> None:
@@ -23,7 +33,18 @@ async def async_general_information(**kwargs: Dict[str, Any]) -> List[Dict[str,
         if not college in spiders:
             raise KeyError(f"未知的学院代号 {college}")
 
-        infos = await spiders[college].async_general_information(**kwargs)
+        if (checkpoint is not None) and checkpoint.has_college(college):
+            infos = checkpoint.college_infos(college)
+            print(f"college `{college}` restored from checkpoint.")
+        else:
+            breaker = get_breaker(import_module(f"fudan.{college}").domain)
+            abandoned = breaker.abandoned
+            incomplete: List[str] = []
+            infos = await spiders[college].async_general_information(incomplete = incomplete, **kwargs)
+            if incomplete:
+                print(f"college `{college}` is incomplete: {len(incomplete)} teachers degraded, not recorded in checkpoint.")
+            if (checkpoint is not None) and (breaker.abandoned == abandoned) and (not incomplete):
+                checkpoint.record_college(college, infos)
 
         for info in infos:
             name = info["name"]
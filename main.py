@@ -1,51 +1,104 @@
+import argparse
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 import json
 import time
 
 from fudan.spider import async_general_information
-from config.constants import ALL_DATA_FILE_PATH, INFORMATION_FILE_PATH, FILE_ENCODING, MAX_WORKERS
+from config.constants import (
+    ALL_DATA_FILE_PATH,
+    INFORMATION_FILE_PATH,
+    FILE_ENCODING,
+    MAX_WORKERS,
+    GENERAL_STAGE_DEADLINE,
+    PAPER_STAGE_DEADLINE,
+)
 from exlibrisgroup.spider import Session
+from src.text_relevance import get_scheme
+from src.text_relevance.executor import create_executor, scoring_stats
+from utils.breaker import all_stats as breaker_stats
+from utils.checkpoint import Checkpoint
+from utils.deadline import hedge_stats, stage_deadline
+from utils.limiter import all_stats
+from utils.retry import all_stats as budget_stats
 # from exlibrisgroup.hosted.fudan_primo.primo_library.libweb.webservices import guestJwt, pnxs
 
 
+def _print_network_stats():
+    for stats in all_stats():
+        print(f"{stats['host']} 的并发上限：{stats['limit']}（调整 {len(stats['history']) - 1} 次）")
+    for stats in breaker_stats():
+        if stats["times_opened"]:
+            print(f"{stats['host']} 的熔断器：{stats}")
+    for stats in hedge_stats():
+        print(f"{stats['host']} 的对冲请求：{stats}")
+    for stats in budget_stats():
+        print(f"{stats['host']} 的重试预算：{stats}")
+
+
+async def async_write_paper_informations(teacher_infos, executor, checkpoint):
+    # 每组同名老师完成后立即写入 ALL_DATA_FILE_PATH ，不在内存中累积
+    async with Session(limit = 100, executor = executor) as session:
+        count = await session.async_write_paper_informations(teacher_infos, ALL_DATA_FILE_PATH, checkpoint = checkpoint)
+        print(f"图书馆请求的连接复用情况：{session.connection_stats()}")
+    return count
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resume", action = "store_true", help = "跳过检查点日志（CHECKPOINT_PATH）中已完成的学院和老师，只爬取剩余的部分")
+    args = parser.parse_args()
+
     obtain_general_data: bool = True
     obtain_paper_data: bool = True
 
-    if obtain_general_data:
-        # 爬取基本数据
-        start_time = time.time()
-        print("开始爬取基本数据。")
-        teacher_infos = asyncio.run(async_general_information())
-        end_time = time.time()
-        print(f"基本信息请求全部完成，耗时 {end_time - start_time:.2f} 秒。")
-        with open(INFORMATION_FILE_PATH, mode = "w", encoding = FILE_ENCODING) as file:
-            for teacher_info in teacher_infos:
-                json.dump(teacher_info, file, ensure_ascii = False)
-                file.write("\n")
-
-    if (not obtain_general_data) and obtain_paper_data:
-        # 从 INFORMATION_FILE_PATH 中读出基本数据
-        teacher_infos = []
-        with open(INFORMATION_FILE_PATH, mode = 'r', encoding = FILE_ENCODING) as file:
-            for line in file.readlines():
-                line = line.strip()
-                if line:
-                    teacher_infos.append(json.loads(line))
-
-    if obtain_paper_data:
-        # 爬取论文数据
-        start = time.time()
-        print("开始爬取论文数据。")
-        with ThreadPoolExecutor(max_workers = MAX_WORKERS) as executor:
-            session = Session(limit = 100, executor = executor)
-            paper_infos = asyncio.run(session.async_paper_informations(teacher_infos))
-        print(f"论文数据爬取完毕，耗时 {time.time() - start:.2f} 秒。")
-        with open(ALL_DATA_FILE_PATH, mode = 'w', encoding = FILE_ENCODING) as file:
-            for paper_info in paper_infos:
-                json.dump(paper_info, file, ensure_ascii=False)
-                file.write("\n")
+    # 记录已完成的学院和老师。不续爬时清空旧的日志
+    with Checkpoint(resume = args.resume) as checkpoint:
+        if obtain_paper_data:
+            # 提前创建打分用的执行器并加载模型，与爬取基本数据同时进行
+            executor = create_executor(max_workers = MAX_WORKERS, warm_up = True)
+
+        if obtain_general_data:
+            # 爬取基本数据
+            start_time = time.time()
+            print("开始爬取基本数据。")
+            with stage_deadline(GENERAL_STAGE_DEADLINE) as deadline:
+                teacher_infos = asyncio.run(async_general_information(checkpoint = checkpoint))
+            end_time = time.time()
+            print(f"基本信息请求全部完成，耗时 {end_time - start_time:.2f} 秒。")
+            _print_network_stats()
+            if deadline.expired:
+                # 结果不完整，不覆盖已有的基本数据，也不在不完整的老师名单上爬取论文数据
+                print(f"已到截止时间，结果不完整，不写入 {INFORMATION_FILE_PATH} 。已完成的学院保留在检查点日志中，可用 --resume 继续。")
+                if obtain_paper_data:
+                    executor.shutdown()
+                raise SystemExit(1)
+            with open(INFORMATION_FILE_PATH, mode = "w", encoding = FILE_ENCODING) as file:
+                for teacher_info in teacher_infos:
+                    json.dump(teacher_info, file, ensure_ascii = False)
+                    file.write("\n")
+
+        if (not obtain_general_data) and obtain_paper_data:
+            # 从 INFORMATION_FILE_PATH 中读出基本数据
+            teacher_infos = []
+            with open(INFORMATION_FILE_PATH, mode = 'r', encoding = FILE_ENCODING) as file:
+                for line in file.readlines():
+                    line = line.strip()
+                    if line:
+                        teacher_infos.append(json.loads(line))
+
+        if obtain_paper_data:
+            # 爬取论文数据
+            start = time.time()
+            print("开始爬取论文数据。")
+            scheme = get_scheme()
+            if hasattr(scheme, "prepare"):
+                scheme.prepare(teacher_infos)
+            with executor, stage_deadline(PAPER_STAGE_DEADLINE):
+                count = asyncio.run(async_write_paper_informations(teacher_infos, executor, checkpoint))
+                # 进程池中的统计信息分散在各工作进程中，须在关闭执行器之前收集
+                print(f"打分的编码统计：{scoring_stats(executor)}")
+            print(f"论文数据爬取完毕，共 {count} 条，耗时 {time.time() - start:.2f} 秒。")
+            _print_network_stats()
 
     # # Test
     # token = "eyJraWQiOiJwcmltb0V4cGxvcmVQcml2YXRlS2V5LUZEVSIsImFsZyI6IkVTMjU2In0.eyJpc3MiOiJQcmltbyIsImp0aSI6IiIsImNtanRpIjpudWxsLCJleHAiOjE3NjE5MTY4MTgsImlhdCI6MTc2MTgzMDQxOCwidXNlciI6ImFub255bW91cy0xMDMwXzEzMjAxOCIsInVzZXJOYW1lIjpudWxsLCJ1c2VyR3JvdXAiOiJHVUVTVCIsImJvckdyb3VwSWQiOm51bGwsInViaWQiOm51bGwsImluc3RpdHV0aW9uIjoiRkRVIiwidmlld0luc3RpdHV0aW9uQ29kZSI6IkZEVSIsImlwIjoiMTM5LjIyNy4yNDQuMTUiLCJwZHNSZW1vdGVJbnN0IjpudWxsLCJvbkNhbXB1cyI6ImZhbHNlIiwibGFuZ3VhZ2UiOiJ6aF9DTiIsImF1dGhlbnRpY2F0aW9uUHJvZmlsZSI6IiIsInZpZXdJZCI6ImZkdSIsImlsc0FwaUlkIjpudWxsLCJzYW1sU2Vzc2lvbkluZGV4IjoiIiwiand0QWx0ZXJuYXRpdmVCZWFjb25JbnN0aXR1dGlvbkNvZGUiOiJGRFUifQ.DSVdzgGYH1GJ9YdgF_tHdJ-eriujZR6p9WjL46xDr0nBgYCts80PVY_aBSFsmgv80GonZRAdLgmArElMa5grgw"
@@ -1,3 +1,58 @@
 """
 计算两段文本间的相关性。
+
+每个方案是本包下的一个模块，需要提供：
+
+- `text_relevance(text1, text2) -> float`
+- `text_relevance_batch(query, candidates) -> List[float]`
+- `warm_up(wait = False) -> None`
+- `RELEVANCE_THRESHOLD: float`
+
+可选地提供：
+
+- `prepare(teacher_infos) -> None` ，在打分开始前调用。
+- `text_relevance_matrix(queries, candidates) -> List[List[float]]` ，一次算出多段查询文本与多段候选文本两两间的相关性。
+  未提供时，score_matrix() 对每段查询文本调用一次 `text_relevance_batch()` 。
 """
+
+from importlib import import_module
+from types import ModuleType
+from typing import Iterable, List
+
+from config.constants import SCHEME
+
+
+def get_scheme(name: str = None) -> ModuleType:
+    """
+    返回计算文本相关性的方案。
+
+    方案在首次调用时才被导入，因此只有真正需要打分的阶段才会加载分词词典或模型。
+
+    Params:
+
+    - `name`: 方案名，即本包下的模块名，如 `"scheme1"` 。默认为 `config.constants.SCHEME` 。
+    """
+    return import_module(f"{__name__}.{name or SCHEME}")
+
+
+def score_matrix(queries: Iterable[str], candidates: Iterable[str]) -> List[List[float]]:
+    """
+    计算多段查询文本与多段候选文本两两间的相关性，如同名的几位老师的研究方向与同一批论文的描述。
+
+    本函数可以直接提交给线程池或进程池。
+
+    Params:
+
+    - `queries`   : 查询文本。
+    - `candidates`: 候选文本。
+
+    Return:
+
+    - 形状为 `(len(queries), len(candidates))` 的嵌套列表，第 i 行第 j 列是第 i 段查询文本与第 j 段候选文本的相关性。
+    """
+    queries = list(queries)
+    candidates = list(candidates)
+    scheme = get_scheme()
+    if hasattr(scheme, "text_relevance_matrix"):
+        return scheme.text_relevance_matrix(queries, candidates)
+    return [scheme.text_relevance_batch(query, candidates) for query in queries]
@@ -0,0 +1,249 @@
+"""
+批量编码。
+
+- 按长度分桶：待编码的文本先按 token 数排序，再按“批内最长长度 × 批大小 ≤ token 预算”的规则分成若干批，
+  使每一批内的文本长度相近，减少填充（padding）带来的无效计算，最后按原顺序还原结果。
+  每段文本只分词一次：分词结果既用来求长度，也直接补齐成批交给模型，不再经过 `model.encode()` 重新分词。
+- 微批处理：`EmbeddingBatcher` 把多个线程（如同时打分的多位老师）各自提交的少量文本合并成一批再编码，
+  使每次前向计算都足够大。
+"""
+
+from concurrent.futures import Future
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+class PaddingStats():
+    """
+    统计编码时的填充效率：有效 token 数 / (批大小 × 批内最长长度) 之和。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tokens = 0        # 有效 token 数
+        self.padded_tokens = 0 # 填充后的 token 数
+        self.batches = 0
+
+
+    def record(self, tokens: int, padded_tokens: int) -> None:
+        with self._lock:
+            self.tokens += tokens
+            self.padded_tokens += padded_tokens
+            self.batches += 1
+
+
+    def to_json(self) -> Dict[str, int | float]:
+        """
+        Return like:
+
+        ```python
+        {"batches": 12, "tokens": 9000, "padded_tokens": 10000, "efficiency": 0.9}
+        ```
+        """
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "tokens": self.tokens,
+                "padded_tokens": self.padded_tokens,
+                "efficiency": self.tokens / self.padded_tokens if self.padded_tokens else 1.0,
+            }
+
+
+# 本进程内所有分桶编码的统计信息
+padding_stats = PaddingStats()
+
+
+def plan_batches(lengths: List[int], token_budget: int) -> List[List[int]]:
+    """
+    按长度分桶。
+
+    Params:
+
+    - `lengths`     : 每段文本的 token 数。
+    - `token_budget`: 每一批的 token 预算，即批大小 × 批内最长长度的上限。单段文本超出预算时独占一批。
+
+    Return:
+
+    - 若干批，每一批是文本下标的列表。批内的文本按长度升序排列。
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for idx in sorted(range(len(lengths)), key = lengths.__getitem__):
+        # 升序遍历，加入后批内最长的就是当前文本
+        if current and lengths[idx] * (len(current) + 1) > token_budget:
+            batches.append(current)
+            current = []
+        current.append(idx)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def encode_bucketed(model, texts: List[str], token_budget: int) -> np.ndarray:
+    """
+    用 `model`（`SentenceTransformer`）按长度分桶编码。调用者需要处在 `torch.inference_mode()` 中。
+
+    Return:
+
+    - 形状为 `(len(texts), dim)` 的数组，第 i 行是第 i 段文本的向量。
+    """
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype = np.float32)
+
+    # 与 SentenceTransformer.tokenize() 相同：去掉首尾空白，截断到 max_seq_length
+    encoded = model.tokenizer([text.strip() for text in texts], truncation = True, max_length = model.max_seq_length)
+    lengths = [len(input_ids) for input_ids in encoded["input_ids"]]
+
+    embeddings: List[np.ndarray | None] = [None] * len(texts)
+    for batch in plan_batches(lengths, token_budget):
+        # 一批只做一次前向计算，与 model.encode() 的计算相同
+        features = model.tokenizer.pad(
+            {key: [values[idx] for idx in batch] for (key, values) in encoded.items()},
+            padding = True,
+            return_tensors = "pt",
+        )
+        features = {key: value.to(model.device) for (key, value) in features.items()}
+        batch_embeddings = model(features)["sentence_embedding"].float().cpu().numpy()
+        for (idx, embedding) in zip(batch, batch_embeddings):
+            embeddings[idx] = embedding
+        padding_stats.record(sum(lengths[idx] for idx in batch), len(batch) * lengths[batch[-1]])
+    return np.stack(embeddings)
+
+
+class EmbeddingBatcher():
+    """
+    进程内共享的编码服务。
+
+    各线程通过 submit() 提交待编码的文本并得到一个 `Future` 。后台线程从队列中收集请求，
+    当攒够 `max_batch_size` 段文本，或最早的请求已等待 `max_wait_ms` 毫秒时，合并成一批交给 `encode`。
+
+    Usage:
+
+    ```python
+    batcher = EmbeddingBatcher(lambda texts: encode_with(model, texts), max_batch_size = 256, max_wait_ms = 10)
+    embeddings = batcher.submit(["编码与信息论"]).result()
+    ```
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch_size: int, max_wait_ms: float):
+        """
+        Params:
+
+        - `encode`        : 批量编码函数，返回形状为 `(len(texts), dim)` 的数组。
+        - `max_batch_size`: 每一批最多的文本数。单个请求超过此值时独占一批。
+        - `max_wait_ms`   : 最早的请求最多等待的毫秒数。
+        """
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: queue.Queue[Tuple[List[str], Future, float]] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._texts = 0
+        self._queue_latency = 0.0     # 所有请求在队列中等待的总秒数
+        self._max_queue_latency = 0.0
+
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        提交待编码的文本。
+
+        Return:
+
+        - `Future` ，其结果是形状为 `(len(texts), dim)` 的数组。`texts` 为空时立即完成，结果是形状为 `(0, 0)` 的数组，不调用 `encode`（以免加载模型）。
+        """
+        future = Future()
+        if not texts:
+            future.set_result(np.empty((0, 0), dtype = np.float32))
+            return future
+        self._ensure_started()
+        self._queue.put((list(texts), future, time.perf_counter()))
+        return future
+
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target = self._run, name = "EmbeddingBatcher", daemon = True)
+                    self._thread.start()
+
+
+    def _collect(self) -> List[Tuple[List[str], Future, float]]:
+        """
+        阻塞直到有请求，再收集一批请求。
+        """
+        requests = [self._queue.get()]
+        size = len(requests[0][0])
+        deadline = requests[0][2] + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout = timeout)
+            except queue.Empty:
+                break
+            requests.append(request)
+            size += len(request[0])
+        return requests
+
+
+    def _run(self) -> None:
+        while True:
+            requests = self._collect()
+            started = time.perf_counter()
+            unique = list(dict.fromkeys(text for (texts, _, _) in requests for text in texts)) # 不同请求中的相同文本只编码一次
+            try:
+                embeddings = dict(zip(unique, self.encode(unique)))
+            except BaseException as e:
+                for (_, future, _) in requests:
+                    future.set_exception(e)
+                continue
+            for (texts, future, _) in requests:
+                future.set_result(np.stack([embeddings[text] for text in texts]))
+
+            latencies = [started - submitted for (_, _, submitted) in requests]
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(requests)
+                self._texts += len(unique)
+                self._queue_latency += sum(latencies)
+                self._max_queue_latency = max(self._max_queue_latency, *latencies)
+
+
+    def stats(self) -> Dict[str, int | float]:
+        """
+        返回批次占用率（平均每批的文本数 / `max_batch_size`）和请求在队列中的等待时间。
+
+        Return like:
+
+        ```python
+        {
+            "batches": 40,
+            "requests": 400,
+            "texts": 8000,
+            "occupancy": 0.78,
+            "mean_queue_latency_ms": 6.1,
+            "max_queue_latency_ms": 10.4,
+        }
+        ```
+        """
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "requests": self._requests,
+                "texts": self._texts,
+                "occupancy": self._texts / (self._batches * self.max_batch_size) if self._batches else 0.0,
+                "mean_queue_latency_ms": 1000 * self._queue_latency / self._requests if self._requests else 0.0,
+                "max_queue_latency_ms": 1000 * self._max_queue_latency,
+            }
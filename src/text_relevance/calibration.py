@@ -0,0 +1,67 @@
+"""
+组合方案（cascade、router）的标定结果。
+
+标定结果由 calculate_scheme2_threshold.py 中的标定函数写入 `CALIBRATION_PATH` ，各方案在导入时读取。
+每条结果记下标定时所用模型的标识（见 scheme1.model_id() 、scheme2.model_id()），
+与当前的模型不一致时视为未标定，避免把在一种打分方式下测得的阈值用在另一种上。
+
+Usage:
+
+```python
+values = load("cascade", scheme1 = scheme1.model_id())
+if values is None:
+    ... # 未标定
+save("cascade", {"LOWER_THRESHOLD": 0.004, "UPPER_THRESHOLD": 0.21}, scheme1 = scheme1.model_id())
+```
+"""
+
+import json
+import os
+from typing import Any, Dict
+
+from config.constants import CALIBRATION_PATH, FILE_ENCODING
+
+
+def _read() -> Dict[str, Dict[str, Any]]:
+    if not os.path.exists(CALIBRATION_PATH):
+        return {}
+    with open(CALIBRATION_PATH, mode = "r", encoding = FILE_ENCODING) as file:
+        return json.load(file)
+
+
+def load(scheme: str, **model_ids: str) -> Dict[str, Any] | None:
+    """
+    读取方案 `scheme` 的标定结果。
+
+    Params:
+
+    - `scheme`   : 方案名，如 `"cascade"` 。
+    - `model_ids`: 当前所用模型的标识，如 `scheme1 = "pairwise"` 。
+
+    Return:
+
+    - 标定结果。若未标定，或标定时所用的模型与 `model_ids` 不一致，则返回 `None` 。
+    """
+    entry = _read().get(scheme)
+    if (entry is None) or (entry.get("models") != model_ids):
+        return None
+    return entry["values"]
+
+
+def save(scheme: str, values: Dict[str, Any], **model_ids: str) -> None:
+    """
+    保存方案 `scheme` 的标定结果，覆盖该方案原有的结果。
+
+    Params:
+
+    - `scheme`   : 方案名，如 `"cascade"` 。
+    - `values`   : 标定结果，如各个阈值及其在标定数据上的准确率。
+    - `model_ids`: 标定时所用模型的标识。
+    """
+    entries = _read()
+    entries[scheme] = {"models": model_ids, "values": values}
+    os.makedirs(os.path.dirname(CALIBRATION_PATH) or ".", exist_ok = True)
+    temp_path = f"{CALIBRATION_PATH}.tmp"
+    with open(temp_path, mode = "w", encoding = FILE_ENCODING) as file:
+        json.dump(entries, file, ensure_ascii = False, indent = 4)
+    os.replace(temp_path, CALIBRATION_PATH)
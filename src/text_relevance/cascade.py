@@ -0,0 +1,141 @@
+"""
+级联方案：先用速度快的 scheme1 打分，只有落在不确定区间内的文本对才交给速度慢的 scheme2 。
+
+- scheme1 的得分低于 `LOWER_THRESHOLD` ：直接判为不相关，得分记为 `0.0` 。
+- scheme1 的得分不低于 `UPPER_THRESHOLD` ：直接判为相关，得分记为 `1.0` 。
+- 其余：使用 scheme2 的得分。
+
+因此本方案的得分与 scheme2 处于同一尺度，`RELEVANCE_THRESHOLD` 与 scheme2 相同。
+
+两个切分点在导入时从 `CALIBRATION_PATH` 读取，须先运行 calculate_scheme2_threshold.cal_cascade_thresholds() 标定。
+未标定时不使用 scheme1 ，所有文本对都直接交给 scheme2 。
+"""
+
+import threading
+from typing import Dict, Iterable, List
+
+from . import calibration, scheme1, scheme2
+
+
+# 每处理这么多文本对，打印一次统计信息
+_REPORT_EVERY: int = 1000
+
+_stats_lock = threading.Lock()
+_pairs = 0     # 已打分的文本对数量
+_escalated = 0 # 其中交给 scheme2 的数量
+
+
+def warm_up(wait: bool = False) -> None:
+    """
+    提前加载两个阶段所需的词典和模型。
+
+    Params:
+
+    - `wait`: 若为 `True` ，则在当前线程中加载并等待完成；否则在后台线程中加载。
+    """
+    if _calibrated is not None:
+        scheme1.warm_up(wait)
+    scheme2.warm_up(wait)
+
+
+def prepare(teacher_infos: Iterable[Dict[str, str]]) -> None:
+    """
+    在打分开始前调用，见 scheme1.prepare() 。
+    """
+    scheme1.prepare(teacher_infos)
+
+
+def stats() -> Dict[str, int | float]:
+    """
+    返回本进程内的统计信息。
+
+    Return like:
+
+    ```python
+    {"pairs": 1000, "escalated": 230, "escalated_ratio": 0.23}
+    ```
+    """
+    with _stats_lock:
+        return {
+            "pairs": _pairs,
+            "escalated": _escalated,
+            "escalated_ratio": _escalated / _pairs if _pairs else 0.0,
+        }
+
+
+def _record(pairs: int, escalated: int) -> None:
+    global _pairs, _escalated
+    with _stats_lock:
+        reported = _pairs // _REPORT_EVERY
+        _pairs += pairs
+        _escalated += escalated
+        should_report = (_pairs // _REPORT_EVERY) > reported
+    if should_report:
+        info = stats()
+        print(f"级联方案已处理 {info['pairs']} 对文本，其中 {info['escalated_ratio']:.1%} 交给了 scheme2 。")
+
+
+def text_relevance(text1: str, text2: str) -> float:
+    """
+    计算两段文本的相关性。
+
+    Params:
+
+    - `text1`: 第一段文本。
+    - `text2`: 第二段文本。
+
+    Return:
+
+    - 相关性分数（0~1之间，值越高相关性越强）。
+    """
+    return text_relevance_batch(text1, [text2])[0]
+
+
+def text_relevance_batch(query: str, candidates: Iterable[str]) -> List[float]:
+    """
+    计算一段文本与多段候选文本的相关性。
+
+    所有候选文本先在一次 scheme1.text_relevance_batch() 中打分，不确定的候选文本再在一次 scheme2.text_relevance_batch() 中打分。
+
+    Params:
+
+    - `query`     : 查询文本，如老师的研究方向。
+    - `candidates`: 候选文本，如各篇论文的描述。
+
+    Return:
+
+    - 与 `candidates` 一一对应的相关性分数。
+    """
+    candidates = list(candidates)
+    if _calibrated is None:
+        # 未标定时所有文本对都交给 scheme2 ，不必用 scheme1 打分
+        _record(len(candidates), len(candidates))
+        return scheme2.text_relevance_batch(query, candidates)
+
+    cheap_scores = scheme1.text_relevance_batch(query, candidates)
+
+    scores = [0.0 if score < LOWER_THRESHOLD else 1.0 for score in cheap_scores]
+    ambiguous = [
+        idx
+        for (idx, score) in enumerate(cheap_scores, start = 0)
+        if LOWER_THRESHOLD <= score < UPPER_THRESHOLD
+    ]
+    if ambiguous:
+        relevances = scheme2.text_relevance_batch(query, [candidates[idx] for idx in ambiguous])
+        for (idx, relevance) in zip(ambiguous, relevances):
+            scores[idx] = relevance
+
+    _record(len(candidates), len(ambiguous))
+    return scores
+
+
+# scheme1 得分的两个切分点，由 calculate_scheme2_threshold.py 中的 cal_cascade_thresholds() 标定，见 calibration.py 。
+# 未标定（或标定时 scheme1 的打分方式与当前不同）时不使用 scheme1 ，全部交给 scheme2 ，结果与 scheme2 相同
+_calibrated = calibration.load("cascade", scheme1 = scheme1.model_id())
+if _calibrated is None:
+    print("级联方案尚未在当前的 scheme1 下标定，所有文本对都交给 scheme2 。")
+LOWER_THRESHOLD: float = 0.0 if _calibrated is None else _calibrated["LOWER_THRESHOLD"]
+UPPER_THRESHOLD: float = float("inf") if _calibrated is None else _calibrated["UPPER_THRESHOLD"]
+
+# 相关性阈值，高于这个值可以认为有较强的相关性
+RELEVANCE_THRESHOLD: float = scheme2.RELEVANCE_THRESHOLD
@@ -0,0 +1,225 @@
+"""
+以文本的哈希值为键、持久化在磁盘上的向量缓存，用于 scheme2 。
+
+缓存存放在一个 SQLite 数据库中，键由模型名与文本共同决定，因此更换 `CROSS_LANGUAGE_MODEL` 后旧的向量不会被误用。
+总大小超过上限时，按最近使用时间淘汰最久未用的向量。
+
+- 读取不写数据库：命中的键的使用时间先记在内存中，在下次写入时或攒够 `_TOUCH_BATCH` 个时一起写回，
+  主进程和 `multiprocessing` 的工作进程退出时也会写回。淘汰依据的使用时间因此可能略旧，对近似的 LRU 没有影响。
+- 总大小在内存中累计，不在每次写入后对整张表求和。累计值超过上限、或每写入 `_RESYNC_EVERY` 次时，
+  才从数据库中重新求和（走 `(last_used, size)` 上的覆盖索引），以计入其他进程的写入和被替换的旧向量。
+"""
+
+import atexit
+import hashlib
+from multiprocessing import util as mp_util
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+# 淘汰时，把总大小降到上限的这个比例以下，避免每次写入都触发淘汰
+_EVICTION_RATIO: float = 0.8
+
+# SQLite 单条语句中参数个数的安全上限
+_SQL_CHUNK_SIZE: int = 500
+
+# 内存中积攒的使用时间达到这个数量时写回数据库
+_TOUCH_BATCH: int = 1000
+
+# 每写入这么多次，从数据库中重新求一次总大小
+_RESYNC_EVERY: int = 100
+
+
+def _chunks(items: List[str], size: int = _SQL_CHUNK_SIZE) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start: start + size]
+
+
+class EmbeddingCache():
+    """
+    文本向量的磁盘缓存。
+
+    线程安全；在多进程中使用时，每个进程会各自打开数据库连接。
+    """
+
+    def __init__(self, path: str, model_name: str, max_bytes: int):
+        """
+        Params:
+
+        - `path`      : SQLite 数据库文件的路径。
+        - `model_name`: 生成向量所用的模型名，会成为键的一部分。
+        - `max_bytes` : 缓存中向量的总字节数上限。若不大于 0 ，则不使用缓存。
+        """
+        self.path = path
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        self._touched: Dict[str, float] = {} # 尚未写回的使用时间
+        self._total_bytes = 0                # 本进程估计的向量总字节数
+        self._puts = 0                       # 上次求和后的写入次数
+        atexit.register(self.flush)
+
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        返回当前进程的数据库连接，必要时新建。
+
+        调用者需要持有 `self._lock` 。
+        """
+        if (self._connection is not None) and (self._pid == os.getpid()):
+            return self._connection
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok = True)
+        connection = sqlite3.connect(self.path, timeout = 30, check_same_thread = False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, "
+            "model TEXT NOT NULL, "
+            "vector BLOB NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "last_used REAL NOT NULL)"
+        )
+        # 淘汰时按 last_used 排序、求总大小时对 size 求和，都只需读这个索引
+        connection.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used, size)")
+        connection.commit()
+
+        self._connection = connection
+        if self._pid != os.getpid():
+            self._touched = {} # 从父进程继承的使用时间由父进程写回
+            # 工作进程退出时不调用 atexit ，但会运行 multiprocessing 的终结器
+            mp_util.Finalize(None, self.flush, exitpriority = 10)
+        self._pid = os.getpid()
+        self._total_bytes = self._sum_bytes(connection)
+        self._puts = 0
+        return connection
+
+
+    def _sum_bytes(self, connection: sqlite3.Connection) -> int:
+        (total_bytes,) = connection.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+        return total_bytes
+
+
+    def get_many(self, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        查询多段文本的向量。
+
+        Return:
+
+        - 文本到向量的映射，只包含命中缓存的文本。
+        """
+        if not self.enabled:
+            return {}
+
+        key_text = {self._key(text): text for text in texts}
+        result: Dict[str, np.ndarray] = {}
+        with self._lock:
+            connection = self._connect()
+            for keys in _chunks(list(key_text)):
+                placeholders = ",".join("?" * len(keys))
+                rows = connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    keys,
+                ).fetchall()
+                for (key, vector) in rows:
+                    result[key_text[key]] = np.frombuffer(vector, dtype = np.float32)
+                self._touched.update(dict.fromkeys((key for (key, _) in rows), time.time()))
+            if len(self._touched) >= _TOUCH_BATCH:
+                self._write_touched(connection)
+                connection.commit()
+        return result
+
+
+    def put_many(self, texts: Iterable[str], vectors: Iterable[np.ndarray]) -> None:
+        """
+        写入多段文本的向量，写入后若超出大小上限则进行淘汰。
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        rows = []
+        for (text, vector) in zip(texts, vectors):
+            blob = np.asarray(vector, dtype = np.float32).tobytes()
+            rows.append((self._key(text), self.model_name, blob, len(blob), now))
+
+        with self._lock:
+            connection = self._connect()
+            self._write_touched(connection)
+            connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._total_bytes += sum(row[3] for row in rows)
+            self._puts += 1
+            if (self._total_bytes > self.max_bytes) or (self._puts >= _RESYNC_EVERY):
+                # 累计值不计其他进程的写入，也不减去被替换的旧向量，因此在判断淘汰前重新求和
+                self._total_bytes = self._sum_bytes(connection)
+                self._puts = 0
+                if self._total_bytes > self.max_bytes:
+                    self._total_bytes = self._evict(connection, self._total_bytes)
+            connection.commit()
+
+
+    def flush(self) -> None:
+        """
+        把内存中积攒的使用时间写回数据库。主进程和 `multiprocessing` 的工作进程退出时会自动调用。
+        """
+        if (not self.enabled) or (not self._touched):
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            connection = self._connect()
+            self._write_touched(connection)
+            connection.commit()
+
+
+    def _write_touched(self, connection: sqlite3.Connection) -> None:
+        """
+        调用者需要持有 `self._lock` ，并在之后提交。
+        """
+        if self._touched:
+            connection.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", ((used, key) for (key, used) in self._touched.items()))
+            self._touched = {}
+
+
+    def _evict(self, connection: sqlite3.Connection, total_bytes: int) -> int:
+        """
+        按最近使用时间淘汰向量，直到总大小不超过上限的 `_EVICTION_RATIO` 。
+
+        调用者需要持有 `self._lock` 。
+
+        Params:
+
+        - `total_bytes`: 当前数据库中向量的总字节数。
+
+        Return:
+
+        - 淘汰后的总字节数。
+        """
+        target = self.max_bytes * _EVICTION_RATIO
+        evicted: List[str] = []
+        cursor = connection.execute("SELECT key, size FROM embeddings ORDER BY last_used")
+        for (key, size) in cursor:
+            if total_bytes <= target:
+                break
+            evicted.append(key)
+            total_bytes -= size
+        for keys in _chunks(evicted):
+            connection.execute(f"DELETE FROM embeddings WHERE key IN ({','.join('?' * len(keys))})", keys)
+        return total_bytes
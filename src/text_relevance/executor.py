@@ -0,0 +1,132 @@
+"""
+创建用于打分的执行器。
+
+- `"thread"` ：线程池，所有线程共用本进程内的模型。
+- `"process"`：进程池，每个工作进程在初始化时加载一次模型，打分不受 GIL 限制。进程数不超过 `SCORING_MAX_PROCESSES` 。
+
+Usage:
+
+```python
+from src.text_relevance import score_matrix
+from src.text_relevance.executor import create_executor
+
+with create_executor("process", max_workers = 8) as executor:
+    matrix = executor.submit(score_matrix, ["编码与信息论"], ["基于多分数阶混沌系统的彩色图像加密算法"]).result()
+    print(scoring_stats(executor)) # 在关闭执行器之前
+```
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import os
+import sys
+import threading
+from typing import Any, Dict, Tuple
+import warnings
+import weakref
+
+from config.constants import MAX_WORKERS, MICRO_BATCH, SCORING_BACKEND, SCORING_MAX_PROCESSES
+from . import get_scheme
+
+
+# 收集统计信息时，每个工作进程在此等待，直到所有工作进程都各领到一个任务
+_STATS_TIMEOUT: float = 10
+
+# 父进程中：进程池 -> (工作进程数, 收集统计信息用的屏障)
+_pools: "weakref.WeakKeyDictionary[ProcessPoolExecutor, Tuple[int, Any]]" = weakref.WeakKeyDictionary()
+
+# 工作进程中：收集统计信息用的屏障
+_barrier: Any = None
+
+
+def _initializer(num_threads: int, barrier: Any) -> None:
+    """
+    工作进程的初始化函数：限制进程内的计算线程数，并加载模型。
+    """
+    global _barrier
+    _barrier = barrier
+    # 必须在导入 torch 之前设置，避免多个进程的计算线程争抢 CPU
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[variable] = str(num_threads)
+    get_scheme().warm_up(wait = True)
+
+
+def _local_stats() -> Dict[str, Any]:
+    """
+    本进程内 scheme2 的编码统计信息。未使用 scheme2 的方案返回 `{}` 。
+    """
+    scheme2 = sys.modules.get(f"{__package__}.scheme2")
+    return scheme2.stats() if scheme2 is not None else {}
+
+
+def _worker_stats() -> Tuple[int, Dict[str, Any]]:
+    # 等其他工作进程也领到任务，保证每个进程恰好报告一次
+    try:
+        _barrier.wait(_STATS_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass
+    return (os.getpid(), _local_stats())
+
+
+def scoring_stats(executor: Executor = None) -> Dict[str, Any]:
+    """
+    返回打分时 scheme2 的编码统计信息（填充效率与微批处理），见 scheme2.stats() 。
+
+    对于进程池，向每个工作进程各收集一次并用 scheme2.merge_stats() 合并，须在关闭进程池之前调用；
+    对于线程池或 `None` ，返回本进程内的统计信息。未使用 scheme2 的方案返回 `{}` 。
+    """
+    if (not isinstance(executor, ProcessPoolExecutor)) or (executor not in _pools):
+        return _local_stats()
+
+    (workers, _) = _pools[executor]
+    futures = [executor.submit(_worker_stats) for _ in range(workers)]
+    infos = dict(future.result() for future in futures) # 屏障失效时同一进程可能报告多次，按进程号去重
+    infos = [info for info in infos.values() if info]
+    if not infos:
+        return {}
+    from . import scheme2
+    return scheme2.merge_stats(infos) | {"processes": len(infos)}
+
+
+def _noop() -> None:
+    pass
+
+
+def create_executor(backend: str = SCORING_BACKEND, max_workers: int = MAX_WORKERS, *, warm_up: bool = False) -> Executor:
+    """
+    创建用于打分的执行器，可以传给 `exlibrisgroup.spider.Session` 。
+
+    Params:
+
+    - `backend`    : `"thread"` 或 `"process"` 。
+    - `max_workers`: 最大并发的线程数或进程数。进程数还不超过 `SCORING_MAX_PROCESSES` ，每个进程各加载一次模型。
+    - `warm_up`    : 是否立即开始加载模型。对于进程池，会立即启动所有工作进程。
+    """
+    if backend == "process":
+        if MICRO_BATCH:
+            # 每个工作进程一次只处理一位老师，批次只能等到 MICRO_BATCH_WAIT_MS 超时，合并不到其他老师的请求
+            warnings.warn("`MICRO_BATCH` only merges requests within one process; use the \"thread\" backend with it", UserWarning)
+        max_workers = min(max_workers, SCORING_MAX_PROCESSES)
+        num_threads = max(1, (os.cpu_count() or 1) // max_workers)
+        context = multiprocessing.get_context("spawn") # 不继承父进程中已初始化的 torch 线程池
+        barrier = context.Barrier(max_workers)
+        executor = ProcessPoolExecutor(
+            max_workers = max_workers,
+            mp_context = context,
+            initializer = _initializer,
+            initargs = (num_threads, barrier),
+        )
+        _pools[executor] = (max_workers, barrier)
+        if warm_up:
+            # 每次提交都会在没有空闲进程时启动一个新进程，新进程在初始化时加载模型
+            for _ in range(max_workers):
+                executor.submit(_noop)
+        return executor
+
+    if backend == "thread":
+        executor = ThreadPoolExecutor(max_workers = max_workers)
+        if warm_up:
+            get_scheme().warm_up()
+        return executor
+
+    raise ValueError(f"`backend` is expected to be 'thread' or 'process', but got {backend!r}")
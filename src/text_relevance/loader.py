@@ -0,0 +1,63 @@
+"""
+延迟加载耗时的对象（如跨语言模型）。
+"""
+
+import threading
+from typing import Callable, Generic, TypeVar
+
+
+T = TypeVar("T")
+
+
+class LazyLoader(Generic[T]):
+    """
+    首次调用 get() 时才加载对象，之后复用同一个对象。
+
+    也可以调用 warm_up() ，在后台线程中提前加载，与网络请求等阶段同时进行。
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        """
+        Params:
+
+        - `factory`: 无参函数，返回要加载的对象。
+        """
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value: T | None = None
+        self._loaded = False
+        self._thread: threading.Thread | None = None
+
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+
+    def get(self) -> T:
+        """
+        返回加载好的对象。若正在后台加载，则等待其完成。
+        """
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                self._value = self._factory()
+                self._loaded = True
+        return self._value
+
+
+    def warm_up(self) -> threading.Thread | None:
+        """
+        在后台线程中加载对象。
+
+        Return:
+
+        - 负责加载的线程；若对象已加载或已在加载，则返回 `None` 。
+        """
+        with self._lock:
+            if self._loaded or (self._thread is not None):
+                return None
+            self._thread = threading.Thread(target = self.get, name = "LazyLoader", daemon = True)
+            self._thread.start()
+            return self._thread
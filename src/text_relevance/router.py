@@ -0,0 +1,156 @@
+"""
+按文字种类路由的方案：纯中文的文本对交给速度快的 scheme1 ，中英文混杂或英文的文本对交给 scheme2 。
+
+两条路由各有一个标定好的阈值。为了与单一的 `RELEVANCE_THRESHOLD` 比较，
+各路由的得分被单调地映射到 [0, 1] ，使各自的阈值恰好对应 `RELEVANCE_THRESHOLD` 。
+
+两个阈值在导入时从 `CALIBRATION_PATH` 读取，须先运行 calculate_scheme2_threshold.cal_route_thresholds() 标定。
+未标定时不启用纯中文路由，所有文本对都交给 scheme2 ，使用其在全部文本对上标定的阈值。
+"""
+
+import threading
+from typing import Dict, Iterable, List
+
+from . import calibration, scheme1, scheme2
+
+
+# 拉丁字母占（汉字 + 拉丁字母）的比例不超过此值时，视为纯中文。允许夹杂少量缩写，如 "RGB"
+_MAX_LATIN_RATIO: float = 0.3
+
+_stats_lock = threading.Lock()
+_chinese_pairs = 0 # 交给 scheme1 的文本对数量
+_mixed_pairs = 0   # 交给 scheme2 的文本对数量
+
+
+def is_pure_chinese(text: str) -> bool:
+    """
+    通过逐字符扫描，判断一段文本是否为纯中文。
+    """
+    cjk = 0
+    latin = 0
+    for char in text:
+        if "\u4e00" <= char <= "\u9fff": # CJK 统一表意文字
+            cjk += 1
+        elif char.isalpha():
+            latin += 1
+    return (cjk > 0) and (latin <= _MAX_LATIN_RATIO * (cjk + latin))
+
+
+def warm_up(wait: bool = False) -> None:
+    """
+    提前加载两条路由所需的词典和模型。
+
+    Params:
+
+    - `wait`: 若为 `True` ，则在当前线程中加载并等待完成；否则在后台线程中加载。
+    """
+    scheme1.warm_up(wait)
+    scheme2.warm_up(wait)
+
+
+def prepare(teacher_infos: Iterable[Dict[str, str]]) -> None:
+    """
+    在打分开始前调用，见 scheme1.prepare() 。
+    """
+    scheme1.prepare(teacher_infos)
+
+
+def stats() -> Dict[str, int | float]:
+    """
+    返回本进程内的路由统计信息。
+
+    Return like:
+
+    ```python
+    {"chinese_pairs": 700, "mixed_pairs": 300, "chinese_ratio": 0.7}
+    ```
+    """
+    with _stats_lock:
+        total = _chinese_pairs + _mixed_pairs
+        return {
+            "chinese_pairs": _chinese_pairs,
+            "mixed_pairs": _mixed_pairs,
+            "chinese_ratio": _chinese_pairs / total if total else 0.0,
+        }
+
+
+def _rescale(score: float, threshold: float) -> float:
+    """
+    把以 `threshold` 为阈值的得分单调地映射到 [0, 1] ，使 `threshold` 对应 `RELEVANCE_THRESHOLD` 。
+    """
+    if score < threshold:
+        return RELEVANCE_THRESHOLD * score / threshold
+    if threshold >= 1:
+        return 1.0
+    return RELEVANCE_THRESHOLD + (1 - RELEVANCE_THRESHOLD) * min(1.0, (score - threshold) / (1 - threshold))
+
+
+def text_relevance(text1: str, text2: str) -> float:
+    """
+    计算两段文本的相关性。
+
+    Params:
+
+    - `text1`: 第一段文本。
+    - `text2`: 第二段文本。
+
+    Return:
+
+    - 相关性分数（0~1之间，值越高相关性越强）。
+    """
+    return text_relevance_batch(text1, [text2])[0]
+
+
+def text_relevance_batch(query: str, candidates: Iterable[str]) -> List[float]:
+    """
+    计算一段文本与多段候选文本的相关性。
+
+    两条路由的候选文本分别在一次批量调用中完成打分。
+
+    Params:
+
+    - `query`     : 查询文本，如老师的研究方向。
+    - `candidates`: 候选文本，如各篇论文的描述。
+
+    Return:
+
+    - 与 `candidates` 一一对应的相关性分数。
+    """
+    global _chinese_pairs, _mixed_pairs
+    candidates = list(candidates)
+
+    if (CHINESE_THRESHOLD is not None) and is_pure_chinese(query):
+        chinese = [idx for (idx, candidate) in enumerate(candidates, start = 0) if is_pure_chinese(candidate)]
+    else:
+        chinese = []
+    chinese_set = set(chinese)
+    mixed = [idx for idx in range(len(candidates)) if idx not in chinese_set]
+
+    scores: List[float] = [0.0] * len(candidates)
+    for (indices, scheme, threshold) in ((chinese, scheme1, CHINESE_THRESHOLD), (mixed, scheme2, MIXED_THRESHOLD)):
+        if not indices:
+            continue
+        relevances = scheme.text_relevance_batch(query, [candidates[idx] for idx in indices])
+        for (idx, relevance) in zip(indices, relevances):
+            scores[idx] = _rescale(relevance, threshold)
+
+    with _stats_lock:
+        _chinese_pairs += len(chinese)
+        _mixed_pairs += len(mixed)
+    return scores
+
+
+# 两条路由的阈值，由 calculate_scheme2_threshold.py 中的 cal_route_thresholds() 标定，见 calibration.py 。
+# 标定时两个方案的打分方式须与当前相同，否则视为未标定
+_calibrated = calibration.load("router", scheme1 = scheme1.model_id(), scheme2 = scheme2.model_id())
+if _calibrated is None:
+    print("路由方案尚未在当前的 scheme1 、scheme2 下标定，所有文本对都交给 scheme2 。")
+
+# 纯中文路由（scheme1）的阈值。为 `None` 时不启用这条路由
+CHINESE_THRESHOLD: float | None = None if _calibrated is None else _calibrated["CHINESE_THRESHOLD"]
+
+# 中英文混杂路由（scheme2）的阈值。未标定时使用 scheme2 在全部文本对上标定的阈值
+MIXED_THRESHOLD: float = scheme2.RELEVANCE_THRESHOLD if _calibrated is None else _calibrated["MIXED_THRESHOLD"]
+
+# 相关性阈值，高于这个值可以认为有较强的相关性。各路由的阈值都被映射到此值
+RELEVANCE_THRESHOLD: float = 0.5
@@ -2,21 +2,93 @@
 通过计算两段文字的余弦相似度来反映相关性。
 
 此方案无法较好地计算中英文混搭的文本。
+
+默认逐对拟合 IDF ：每对查询文本与候选文本只在这两段文本上计算 IDF ，与一页中还有哪些候选文本无关，
+`RELEVANCE_THRESHOLD` 即是在这种方式下标定的。两段文本的 IDF 只有两种取值，因此不必为每对文本拟合 `TfidfVectorizer` ，
+而是直接由词频算出相同的余弦相似度，见 _pairwise_relevance() 。
+
+也可以用 calculate_scheme2_threshold.cal_scheme1_tfidf() 在固定的语料（带标签的文本对）上拟合一次 IDF ，
+并在同一语料上重新标定阈值，两者一起持久化到 `TFIDF_MODEL_PATH` 。此后为每个老师打分时只需一次稀疏矩阵与向量的乘法，
+加载模型时 `RELEVANCE_THRESHOLD` 也换成与之配套的阈值。格式不符（如旧版本保存）的模型文件会被忽略。
 """
 
-from typing import List
+from collections import Counter
+from functools import lru_cache
+import math
+import os
+import pickle
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
 import jieba
+import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
-from config.constants import STOPWORDS
+from config.constants import (
+    STOPWORDS,
+    TFIDF_MODEL_PATH,
+    JIEBA_CACHE_PATH,
+    TOKEN_CACHE_SIZE,
+)
+from .loader import LazyLoader
+
+
+# 停用词在模块加载时固定下来，成员判断更快
+_STOPWORDS = frozenset(STOPWORDS)
+
+# jieba 在首次分词时才构建前缀词典，可以用 warm_up() 提前构建。
+# 构建好的词典序列化到 JIEBA_CACHE_PATH ，之后的运行以及各个工作进程都直接从中加载
+jieba.dt.tmp_dir = os.path.dirname(JIEBA_CACHE_PATH) or "."
+jieba.dt.cache_file = os.path.basename(JIEBA_CACHE_PATH)
+_dictionary = LazyLoader(jieba.initialize)
+
+# TF-IDF 模型文件的格式版本。模型与阈值的保存方式改变时递增，旧文件随之失效
+_TFIDF_FORMAT: int = 2
+
+# 在固定语料上拟合好的 TF-IDF 模型及其标定信息，用 _get_vectorizer() 获取
+_vectorizer: TfidfVectorizer | None = None
+_model_info: Dict[str, Any] = {}
+_vectorizer_lock = threading.Lock()
+_loaded = False
+
+
+def warm_up(wait: bool = False) -> None:
+    """
+    提前初始化 jieba 的词典。
+
+    Params:
+
+    - `wait`: 若为 `True` ，则在当前线程中初始化并等待完成；否则在后台线程中初始化。
+    """
+    if wait:
+        _dictionary.get()
+    else:
+        _dictionary.warm_up()
+
+
+def iter_tokens(text: str) -> Iterator[str]:
+    """
+    分词，并过滤停用词和空字符。逐个产出词语，不构建中间列表。
+
+    Params:
+
+    - `text`: 文本，可以中英文混搭。如：`"编码与信息论，密码学与信息安全，计算复杂性。"`
+
+    Yield like: `'编码'`, `'信息'`, `'信息论'`, ...
+    """
+    for word in jieba.cut(text, cut_all = True): # 分词
+        if (word not in _STOPWORDS) and word.strip(): # 去停用词和空字符
+            yield word
 
 
-def tokenize(text: str) -> List[str]:
+@lru_cache(maxsize = TOKEN_CACHE_SIZE)
+def tokenize(text: str) -> Tuple[str, ...]:
     """
     分词函数，并过滤停用词和空字符。
 
+    结果按文本缓存（LRU），同一位老师的研究方向只需分词一次。
+
     Params:
 
     - `text`: 文本，可以中英文混搭。如：`"编码与信息论，密码学与信息安全，计算复杂性。"`
@@ -24,42 +96,211 @@ def tokenize(text: str) -> List[str]:
     Return like:
 
     ```python
-    ['编码', '信息', '信息论', '密码', '密码学', '信息', '信息安全', '安全', '计算', '复杂', '复杂性']
+    ('编码', '信息', '信息论', '密码', '密码学', '信息', '信息安全', '安全', '计算', '复杂', '复杂性')
     ```
     """
-    words = jieba.cut(text, cut_all = True) # 分词
-    return [word for word in words if word.strip() and word not in STOPWORDS] # 去停用词和空字符
+    return tuple(iter_tokens(text))
+
+
+# 逐对拟合时，只出现在一段文本中的词的 IDF ：ln((1 + 2) / (1 + 1)) + 1 。两段文本中都出现的词的 IDF 为 1
+_PAIR_IDF: float = math.log(1.5) + 1
+
+
+def _term_counts(text: str) -> Counter:
+    # 与 TfidfVectorizer 一样，先转为小写再分词
+    return Counter(tokenize(text.lower()))
+
+
+def _pairwise_relevance(counts1: Counter, counts2: Counter) -> float:
+    """
+    计算只在两段文本上拟合 IDF 时，两者 TF-IDF 向量的余弦相似度，与 `TfidfVectorizer().fit_transform([text1, text2])` 的结果相同。
+
+    只有两段文本中都出现的词对内积有贡献，它们的 IDF 为 1 ；其余的词只影响向量的模长。
+    """
+    shared = counts1.keys() & counts2.keys()
+    if not shared:
+        return 0.0
+    dot = sum(counts1[word] * counts2[word] for word in shared)
+    norm1 = sum((count if word in shared else count * _PAIR_IDF) ** 2 for (word, count) in counts1.items())
+    norm2 = sum((count if word in shared else count * _PAIR_IDF) ** 2 for (word, count) in counts2.items())
+    return min(1.0, dot / math.sqrt(norm1 * norm2))
+
+
+def _new_vectorizer() -> TfidfVectorizer:
+    return TfidfVectorizer(tokenizer = tokenize, token_pattern = None)
+
+
+def _get_vectorizer() -> TfidfVectorizer | None:
+    """
+    返回在固定语料上拟合好的 TF-IDF 模型，并把 `RELEVANCE_THRESHOLD` 换成与之配套的阈值。
+    若模型文件不存在或格式不符，则返回 `None` 。
+    """
+    global _loaded
+    if not _loaded:
+        with _vectorizer_lock:
+            if not _loaded:
+                _load(_read_payload())
+                _loaded = True
+    return _vectorizer
+
+
+def _read_payload() -> Dict[str, Any] | None:
+    if not os.path.exists(TFIDF_MODEL_PATH):
+        return None
+    with open(TFIDF_MODEL_PATH, mode = "rb") as file:
+        payload = pickle.load(file)
+    if (not isinstance(payload, dict)) or (payload.get("format") != _TFIDF_FORMAT):
+        print(f"忽略格式不符的 TF-IDF 模型 {TFIDF_MODEL_PATH} ，逐对拟合。")
+        return None
+    return payload
+
+
+def _load(payload: Dict[str, Any] | None) -> None:
+    global _vectorizer, _model_info, RELEVANCE_THRESHOLD
+    if payload is None:
+        return
+    _vectorizer = payload["vectorizer"]
+    _model_info = {key: value for (key, value) in payload.items() if key != "vectorizer"}
+    RELEVANCE_THRESHOLD = payload["threshold"]
+
+
+def fit_vectorizer(corpus: Iterable[str]) -> TfidfVectorizer:
+    """
+    在语料 `corpus` 上拟合 TF-IDF 模型，不持久化。语料应与打分的文本形状相同。
+    """
+    return _new_vectorizer().fit([text for text in corpus if text])
+
+
+def save_model(vectorizer: TfidfVectorizer, threshold: float, accuracy: float, description: str) -> None:
+    """
+    把在固定语料上拟合的 TF-IDF 模型与在该模型下标定的阈值一起持久化到 `TFIDF_MODEL_PATH` ，并在本进程中启用。
+
+    Params:
+
+    - `vectorizer` : fit_vectorizer() 拟合的模型。
+    - `threshold`  : 在该模型下标定的相关性阈值。
+    - `accuracy`   : 该阈值对应的分类准确率。
+    - `description`: 语料的说明，如 `"data/labelled_pairs.jsonl 中的 subject 与 article_info"` 。
+    """
+    global _loaded
+    payload = {
+        "format": _TFIDF_FORMAT,
+        "vectorizer": vectorizer,
+        "threshold": threshold,
+        "accuracy": accuracy,
+        "corpus": description,
+        "fitted_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+    os.makedirs(os.path.dirname(TFIDF_MODEL_PATH) or ".", exist_ok = True)
+    temp_path = f"{TFIDF_MODEL_PATH}.tmp"
+    with open(temp_path, mode = "wb") as file:
+        pickle.dump(payload, file)
+    os.replace(temp_path, TFIDF_MODEL_PATH)
+
+    with _vectorizer_lock:
+        _load(payload)
+        _loaded = True
+
+
+def model_id() -> str:
+    """
+    返回当前打分方式的标识：逐对拟合 IDF 时为 `"pairwise"` ，否则为所加载的模型的拟合时间。
+    在某种打分方式下标定的阈值只适用于这种方式，见 calibration.py 。
+    """
+    if _get_vectorizer() is None:
+        return "pairwise"
+    return f"tfidf@{_model_info['fitted_at']}"
+
+
+def prepare(teacher_infos: Iterable[Dict[str, str]]) -> None:
+    """
+    在打分开始前调用。加载持久化的 TF-IDF 模型及其阈值（若有），使之后读取的 `RELEVANCE_THRESHOLD` 与打分方式一致。
+
+    不会自动拟合：以往输出的论文描述只包含被接受的论文，且与打分的文本形状不同，不宜作为语料。
+    """
+    if _get_vectorizer() is None:
+        print(f"逐对拟合 IDF ，阈值为 {RELEVANCE_THRESHOLD} 。")
+    else:
+        print(f"使用 TF-IDF 模型 {TFIDF_MODEL_PATH}（{_model_info['corpus']}，{_model_info['fitted_at']}），阈值为 {RELEVANCE_THRESHOLD} 。")
 
 
 def text_relevance(text1: str, text2: str) -> float:
     """
     计算两段中文文本的相关性（余弦相似度）
-    
+
     Params:
 
     - `text1`: 第一段文本。
     - `text2`: 第二段文本。
-    
+
     Return:
-    
+
     - 相关性分数（0~1之间，值越高相关性越强）。
     """
+    return text_relevance_batch(text1, [text2])[0]
+
+
+def text_relevance_batch(query: str, candidates: Iterable[str]) -> List[float]:
+    """
+    计算一段文本与多段候选文本的相关性。
+
+    查询文本和候选文本被转换为 TF-IDF 向量（已做 L2 归一化），再用一次稀疏矩阵与向量的乘法求出余弦相似度。
+
+    Params:
+
+    - `query`     : 查询文本，如老师的研究方向。
+    - `candidates`: 候选文本，如各篇论文的描述。
+
+    Return:
+
+    - 与 `candidates` 一一对应的相关性分数。
+    """
+    return text_relevance_matrix([query], candidates)[0]
 
-    # 处理空文本
-    if (not text1) or (not text2):
-        return 0.0
 
-    # 用TF-IDF将文本转换为向量
-    vectorizer = TfidfVectorizer(tokenizer=tokenize)
+def text_relevance_matrix(queries: Iterable[str], candidates: Iterable[str]) -> List[List[float]]:
+    """
+    计算多段查询文本与多段候选文本两两间的相关性。
+
+    有在固定语料上拟合的模型时，用一次稀疏矩阵乘法求出余弦相似度；否则逐对拟合，见 _pairwise_relevance() 。
+
+    Params:
+
+    - `queries`   : 查询文本，如同名的几位老师的研究方向。
+    - `candidates`: 候选文本，如各篇论文的描述。
+
+    Return:
+
+    - 形状为 `(len(queries), len(candidates))` 的嵌套列表。空的查询文本与所有候选文本的相关性均为 `0.0` 。
+    """
+    queries = list(queries)
+    candidates = list(candidates)
+
+    # 处理空文本
+    if (not any(queries)) or (not candidates):
+        return [[0.0] * len(candidates) for _ in queries]
 
-    # 合并两段文本进行拟合（确保词表一致）
-    tfidf_matrix = vectorizer.fit_transform([text1, text2])
+    vectorizer = _get_vectorizer()
+    if vectorizer is None:
+        # 没有在固定语料上拟合的模型，则逐对拟合，每对文本的得分与同一页中的其他候选文本无关
+        candidate_counts = [_term_counts(candidate) for candidate in candidates]
+        return [
+            [_pairwise_relevance(query_counts, counts) for counts in candidate_counts] if query_counts else [0.0] * len(candidates)
+            for query_counts in map(_term_counts, queries)
+        ]
 
-    # 计算余弦相似度（返回值范围0~1）
-    similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
+    try:
+        query_matrix = vectorizer.transform(queries)         # 形状：(Q, V)
+        candidate_matrix = vectorizer.transform(candidates)  # 形状：(N, V)
+    except ValueError:
+        # 所有文本在去停用词后都为空
+        return [[0.0] * len(candidates) for _ in queries]
 
-    return similarity
+    similarities = (query_matrix @ candidate_matrix.T).toarray()
+    return np.clip(similarities, 0.0, 1.0).tolist()
 
 
 # 相关性阈值，高于这个值可以认为有较强的相关性
+# 此值是在逐对拟合 IDF 时标定的；加载在固定语料上拟合的模型时，换成与该模型一起保存的阈值，见 _load()
 RELEVANCE_THRESHOLD: float = 0.013
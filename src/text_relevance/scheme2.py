@@ -2,20 +2,175 @@
 通过计算两段文字的余弦相似度来反映相关性。
 
 此方案可以很好地计算中英文混搭的文本。
+
+若 `QUANTIZE_MODEL` 为 `True` ，则对模型的线性层做动态 int8 量化，在只有 CPU 的机器上更快，但得分会略有变化，
+可以用 calculate_scheme2_threshold.py 中的 cal_quantization_report() 评估。
 """
 
 import os
+from typing import Any, Dict, Iterable, List
 os.environ["HF_ENDPOINT"] = "https://hf-mirror.com" # 清华镜像加速模型下载
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"  # 禁用符号链接警告
 
-from sentence_transformers import SentenceTransformer, util
+import numpy as np
+
+from config.constants import (
+    CROSS_LANGUAGE_MODEL,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_BYTES,
+    QUANTIZE_MODEL,
+    MAX_SEQ_LENGTH,
+    ENCODE_TOKEN_BUDGET,
+    MICRO_BATCH,
+    MICRO_BATCH_SIZE,
+    MICRO_BATCH_WAIT_MS,
+)
+from .batching import EmbeddingBatcher, encode_bucketed, padding_stats
+from .embedding_cache import EmbeddingCache
+from .loader import LazyLoader
+
+
+def load_model(quantize: bool = QUANTIZE_MODEL, max_seq_length: int = MAX_SEQ_LENGTH):
+    """
+    加载跨语言模型。
+
+    Params:
+
+    - `quantize`      : 是否对线性层做动态 int8 量化（仅用于 CPU）。
+    - `max_seq_length`: 最大序列长度（token 数），更长的文本会被截断。若为 `0` ，则使用模型的默认值。
+    """
+    # 在此处才导入 sentence_transformers ，使导入本模块时不必加载 torch
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(CROSS_LANGUAGE_MODEL, device = "cpu" if quantize else None) # 首次加载会从网上下载，耗时较长
+    if max_seq_length:
+        model.max_seq_length = max_seq_length
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype = torch.qint8)
+    print(f"跨语言模型加载完成{'（int8 量化）' if quantize else ''}")
+    return model
+
+
+def model_id(quantize: bool = QUANTIZE_MODEL, max_seq_length: int = MAX_SEQ_LENGTH) -> str:
+    """
+    返回模型及其推理配置的标识，不同配置得到的向量不同，不能共用缓存。
+    """
+    parts = [CROSS_LANGUAGE_MODEL]
+    if quantize:
+        parts.append("int8")
+    if max_seq_length:
+        parts.append(f"max_seq_length={max_seq_length}")
+    return ":".join(parts)
+
+
+def encode_with(model, texts: List[str]) -> np.ndarray:
+    """
+    不经过缓存，直接用 `model` 按长度分桶编码，见 batching.encode_bucketed() 。
+    """
+    import torch
+
+    with torch.inference_mode():
+        return encode_bucketed(model, texts, ENCODE_TOKEN_BUDGET)
+
+
+# 模型在首次编码时才加载，用 model.get() 获取
+model = LazyLoader(load_model)
+
+# 向量缓存
+cache = EmbeddingCache(EMBEDDING_CACHE_PATH, model_id(), EMBEDDING_CACHE_MAX_BYTES)
+
+# 进程内共享的编码服务，仅在 `MICRO_BATCH` 为 `True` 时使用
+batcher = EmbeddingBatcher(lambda texts: encode_with(model.get(), texts), MICRO_BATCH_SIZE, MICRO_BATCH_WAIT_MS)
+
+
+def warm_up(wait: bool = False) -> None:
+    """
+    提前加载模型。
+
+    Params:
+
+    - `wait`: 若为 `True` ，则在当前线程中加载并等待完成；否则在后台线程中加载。
+    """
+    if wait:
+        model.get()
+    else:
+        model.warm_up()
+
+
+def stats() -> Dict[str, Any]:
+    """
+    返回本进程内编码的填充效率，见 batching.PaddingStats.to_json() 。
+    若启用了微批处理，还包括 `"micro_batch"` ：batching.EmbeddingBatcher.stats() 。
+
+    进程池中各工作进程的统计信息可以用 merge_stats() 合并，见 executor.scoring_stats() 。
+    """
+    info: Dict[str, Any] = padding_stats.to_json()
+    if MICRO_BATCH:
+        info["micro_batch"] = batcher.stats()
+    return info
+
+
+def merge_stats(infos: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并多个进程的 stats() ，各项计数相加，比例和平均值按合并后的计数重新计算。
+    """
+    infos = list(infos)
+    tokens = sum(info["tokens"] for info in infos)
+    padded_tokens = sum(info["padded_tokens"] for info in infos)
+    merged: Dict[str, Any] = {
+        "batches": sum(info["batches"] for info in infos),
+        "tokens": tokens,
+        "padded_tokens": padded_tokens,
+        "efficiency": tokens / padded_tokens if padded_tokens else 1.0,
+    }
+    micro_batches = [info["micro_batch"] for info in infos if "micro_batch" in info]
+    if micro_batches:
+        batches = sum(info["batches"] for info in micro_batches)
+        requests = sum(info["requests"] for info in micro_batches)
+        texts = sum(info["texts"] for info in micro_batches)
+        merged["micro_batch"] = {
+            "batches": batches,
+            "requests": requests,
+            "texts": texts,
+            "occupancy": texts / (batches * MICRO_BATCH_SIZE) if batches else 0.0,
+            "mean_queue_latency_ms": sum(info["mean_queue_latency_ms"] * info["requests"] for info in micro_batches) / requests if requests else 0.0,
+            "max_queue_latency_ms": max(info["max_queue_latency_ms"] for info in micro_batches),
+        }
+    return merged
+
+
+def _cos_sim(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    计算 `a` 的每一行与 `b` 的每一行的余弦相似度。
+    """
+    a = a / np.maximum(np.linalg.norm(a, axis = 1, keepdims = True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis = 1, keepdims = True), 1e-12)
+    return a @ b.T
+
 
-from config.constants import CROSS_LANGUAGE_MODEL
+def encode(texts: Iterable[str]) -> np.ndarray:
+    """
+    将多段文本编码为向量。
 
+    先查询向量缓存，只有未命中的文本才会按长度分桶编码，编码结果会写回缓存。
+    若 `MICRO_BATCH` 为 `True` ，未命中的文本会提交给 `batcher` ，与其它线程的请求合并编码。
 
-# 加载模型
-model = SentenceTransformer("xlm-r-bert-base-nli-stsb-mean-tokens") # 首次加载会从网上下载，耗时较长
-print("跨语言模型加载完成")
+    Return:
+
+    - 形状为 `(len(texts), dim)` 的数组，第 i 行是第 i 段文本的向量。
+    """
+    texts = list(texts)
+    vectors = cache.get_many(texts)
+    missing = list(dict.fromkeys(text for text in texts if text not in vectors)) # 去重并保持顺序
+    if missing:
+        if MICRO_BATCH:
+            embeddings = batcher.submit(missing).result()
+        else:
+            embeddings = encode_with(model.get(), missing)
+        cache.put_many(missing, embeddings)
+        vectors.update(zip(missing, embeddings))
+    return np.stack([vectors[text] for text in texts])
 
 
 def text_relevance(text1: str, text2: str) -> float:
@@ -31,8 +186,49 @@ def text_relevance(text1: str, text2: str) -> float:
     
     - 相关性分数（0~1之间，值越高相关性越强）。
     """
-    emb = model.encode([text1, text2], convert_to_tensor = True)
-    return util.cos_sim(emb[0], emb[1]).item()
+    emb = encode([text1, text2])
+    return float(_cos_sim(emb[0:1], emb[1:2])[0, 0])
+
+
+def text_relevance_batch(query: str, candidates: Iterable[str]) -> List[float]:
+    """
+    计算一段文本与多段候选文本的相关性。
+
+    查询文本与所有候选文本在同一次 encode() 中编码，再用一次矩阵运算求出余弦相似度。
+
+    Params:
+
+    - `query`     : 查询文本，如老师的研究方向。
+    - `candidates`: 候选文本，如各篇论文的描述。
+
+    Return:
+
+    - 与 `candidates` 一一对应的相关性分数。
+    """
+    return text_relevance_matrix([query], candidates)[0]
+
+
+def text_relevance_matrix(queries: Iterable[str], candidates: Iterable[str]) -> List[List[float]]:
+    """
+    计算多段查询文本与多段候选文本两两间的相关性。
+
+    所有文本在同一次 encode() 中编码，再用一次矩阵运算求出余弦相似度。
+
+    Params:
+
+    - `queries`   : 查询文本，如同名的几位老师的研究方向。
+    - `candidates`: 候选文本，如各篇论文的描述。
+
+    Return:
+
+    - 形状为 `(len(queries), len(candidates))` 的嵌套列表。
+    """
+    queries = list(queries)
+    candidates = list(candidates)
+    if not candidates:
+        return [[] for _ in queries]
+    emb = encode([*queries, *candidates])
+    return _cos_sim(emb[:len(queries)], emb[len(queries):]).tolist()
 
 
 # 相关性阈值，高于这个值可以认为有较强的相关性
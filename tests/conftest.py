@@ -0,0 +1,35 @@
+from importlib import import_module
+from typing import Awaitable, Callable
+
+import aiohttp
+from aiohttp import web
+import pytest
+
+pnxs_module = import_module("exlibrisgroup.hosted.fudan_primo.primo_library.libweb.webservices.rest.primo_explore.v1.pnxs")
+
+
+@pytest.fixture
+def fetch_error(monkeypatch: pytest.MonkeyPatch) -> Callable[[int], Awaitable[aiohttp.ClientResponseError]]:
+    """
+    返回一个协程函数：让 async_pnxs_page() 请求一个总是返回 `status` 的本地服务器，返回其抛出的异常。
+    """
+    async def fetch(status: int) -> aiohttp.ClientResponseError:
+        async def handler(request: web.Request) -> web.Response:
+            return web.Response(status = status, text = "{}")
+
+        app = web.Application()
+        app.router.add_get("/pnxs", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(pnxs_module, "_get_arguments", lambda *args, **kwargs: {"url": f"http://127.0.0.1:{port}/pnxs"})
+        try:
+            with pytest.raises(aiohttp.ClientResponseError) as info:
+                await pnxs_module.async_pnxs_page("token", "阚海斌", 10, "fdu")
+            return info.value
+        finally:
+            await runner.cleanup()
+
+    return fetch
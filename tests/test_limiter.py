@@ -0,0 +1,24 @@
+"""
+被限流的响应使自适应并发限制器减小并发上限。
+"""
+
+import asyncio
+
+import aiohttp
+import pytest
+
+from utils.limiter import AdaptiveLimiter
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_throttled_response_decreases_limit(status: int, fetch_error):
+    limiter = AdaptiveLimiter("127.0.0.1", initial_limit = 8, max_limit = 8)
+
+    async def main():
+        with pytest.raises(aiohttp.ClientResponseError):
+            async with limiter.slot():
+                raise await fetch_error(status)
+
+    asyncio.run(main())
+    assert limiter.limit == 4
+    assert limiter.history[-1][1:] == (4, "throttled")
@@ -0,0 +1,52 @@
+"""
+流水线的某个阶段出错时，等待该组老师的调用者收到异常，而不是一直等待；工作协程继续处理其他组。
+"""
+
+import asyncio
+
+import pytest
+
+from exlibrisgroup import pipeline as pipeline_module
+from exlibrisgroup.pipeline import PaperPipeline
+
+
+class _Session():
+    adaptive = True
+    first_page_size = 10
+    limit = 100
+    executor = None
+
+    def _search_arguments(self, name, **kwargs):
+        if name == "fetch_error":
+            raise KeyError(name)
+        return {}
+
+    async def _async_fetch(self, name, func, **arguments):
+        return ([{}], 1)
+
+    def _prepare_articles(self, homonyms, pnx_infos):
+        return ([], [""], [])
+
+    def _next_page_size(self, offset, size, total, fetched, accepted):
+        if offset and (self.name == "score_error"):
+            raise ValueError("next page")
+        return (0, "done")
+
+
+@pytest.mark.parametrize("name, error", [("fetch_error", KeyError), ("score_error", ValueError)])
+def test_stage_error_resolves_future(name: str, error: type, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(pipeline_module, "score_matrix", lambda queries, texts: [[] for _ in queries])
+    monkeypatch.setattr(pipeline_module, "assign_articles", lambda candidates, matrix: [[] for _ in matrix])
+    session = _Session()
+    session.name = name
+
+    async def main():
+        async with PaperPipeline(session, window = 1, score_workers = 1) as pipeline:
+            with pytest.raises(error):
+                await asyncio.wait_for(pipeline.submit([{"name": name}]), timeout = 5)
+            # 工作协程仍在运行
+            session.name = "ok"
+            (paper_infos, complete) = await asyncio.wait_for(pipeline.submit([{"name": "ok"}]), timeout = 5)
+            assert (paper_infos, complete) == ([[]], True)
+
+    asyncio.run(main())
@@ -0,0 +1,34 @@
+"""
+HTTP 状态码经 raise_for_status() 抛出后，重试策略能正确分类；各主机的重试预算互不影响。
+"""
+
+import asyncio
+
+import pytest
+
+from utils import retry
+from utils.retry import classify, get_retry_budget, RetryPolicy, THROTTLED, TRANSIENT, PERMANENT
+
+
+@pytest.mark.parametrize(("status", "kind"), [(429, THROTTLED), (503, THROTTLED), (502, TRANSIENT), (404, PERMANENT)])
+def test_status_is_classified(status: int, kind: str, fetch_error):
+    error = asyncio.run(fetch_error(status))
+    assert error.status == status
+    assert classify(error) == kind
+
+
+def test_retry_budget_is_per_host(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(retry, "_budgets", {})
+    policy = RetryPolicy(max_attempts = 3, base_delay = 0)
+
+    async def fail():
+        raise ConnectionError("down")
+
+    async def main():
+        for _ in range(30):
+            with pytest.raises(ConnectionError):
+                await policy.call(fail, host = "flaky.example.com")
+
+    asyncio.run(main())
+    assert get_retry_budget("flaky.example.com").exhausted > 0
+    assert get_retry_budget("primo.example.com").withdraw()
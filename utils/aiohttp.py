@@ -0,0 +1,132 @@
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict
+
+import aiohttp
+
+from config.constants import (
+    CONNECTION_LIMIT,
+    CONNECTION_LIMIT_PER_HOST,
+    KEEPALIVE_TIMEOUT,
+    DNS_CACHE_TTL,
+    REQUEST_TIMEOUT,
+    REQUEST_CONNECT_TIMEOUT,
+)
+
+
+# 所有 `aiohttp.ClientSession` 的默认超时。单个请求可以通过 `timeout` 参数覆盖
+CLIENT_TIMEOUT = aiohttp.ClientTimeout(total = REQUEST_TIMEOUT, sock_connect = REQUEST_CONNECT_TIMEOUT)
+
+
+class ConnectionStats():
+    """
+    通过 `aiohttp.TraceConfig` 统计连接的复用情况。
+
+    若连接被充分复用，`connections_created` 应约等于连接池中的连接数，且远小于 `requests` 。
+    """
+
+    def __init__(self):
+        self.requests = 0              # 发出的请求数
+        self.connections_created = 0   # 新建的连接数（每个都要经过 TCP/TLS 握手）
+        self.connections_reused = 0    # 复用已有连接的次数
+        self.dns_resolutions = 0       # 实际进行的 DNS 解析次数
+        self.dns_cache_hits = 0        # 命中 DNS 缓存的次数
+
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_start.append(self._on_request_start)
+        self.trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        self.trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        self.trace_config.on_dns_resolvehost_end.append(self._on_dns_resolvehost_end)
+        self.trace_config.on_dns_cache_hit.append(self._on_dns_cache_hit)
+
+
+    async def _on_request_start(self, session: aiohttp.ClientSession, context: SimpleNamespace, params) -> None:
+        self.requests += 1
+
+
+    async def _on_connection_create_end(self, session: aiohttp.ClientSession, context: SimpleNamespace, params) -> None:
+        self.connections_created += 1
+
+
+    async def _on_connection_reuseconn(self, session: aiohttp.ClientSession, context: SimpleNamespace, params) -> None:
+        self.connections_reused += 1
+
+
+    async def _on_dns_resolvehost_end(self, session: aiohttp.ClientSession, context: SimpleNamespace, params) -> None:
+        self.dns_resolutions += 1
+
+
+    async def _on_dns_cache_hit(self, session: aiohttp.ClientSession, context: SimpleNamespace, params) -> None:
+        self.dns_cache_hits += 1
+
+
+    def to_json(self) -> Dict[str, int | float]:
+        """
+        Return like:
+
+        ```python
+        {
+            "requests": 1200,
+            "connections_created": 20,
+            "connections_reused": 1180,
+            "reuse_ratio": 0.98,
+            "dns_resolutions": 1,
+            "dns_cache_hits": 19,
+        }
+        ```
+        """
+        connections = self.connections_created + self.connections_reused
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_ratio": self.connections_reused / connections if connections else 0.0,
+            "dns_resolutions": self.dns_resolutions,
+            "dns_cache_hits": self.dns_cache_hits,
+        }
+
+
+def create_client_session(stats: ConnectionStats = None, **kwargs: Dict) -> aiohttp.ClientSession:
+    """
+    创建一个长期使用的 `aiohttp.ClientSession` ，其连接池按 `config.constants` 中的参数配置：
+    限制每个主机的连接数，保持空闲连接，缓存 DNS 解析结果，并接受 gzip 压缩的响应。默认超时为 `CLIENT_TIMEOUT` 。
+
+    必须在事件循环中调用。
+
+    Params:
+
+    - `stats` : 若提供，则用它统计连接的复用情况。
+    - `kwargs`: 其他传递给 `aiohttp.ClientSession()` 的参数。
+    """
+    connector = aiohttp.TCPConnector(
+        limit = CONNECTION_LIMIT,
+        limit_per_host = CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout = KEEPALIVE_TIMEOUT,
+        ttl_dns_cache = DNS_CACHE_TTL,
+    )
+    return aiohttp.ClientSession(
+        connector = connector,
+        headers = {"Accept-Encoding": "gzip, deflate"},
+        trace_configs = [stats.trace_config] if stats else None,
+        **({"timeout": CLIENT_TIMEOUT} | kwargs)
+    )
+
+
+@asynccontextmanager
+async def borrow_client_session(session: aiohttp.ClientSession = None) -> AsyncIterator[aiohttp.ClientSession]:
+    """
+    若提供了 `session` ，则直接使用它，退出时不关闭；否则创建一个临时的 `aiohttp.ClientSession` ，退出时关闭。
+
+    Usage:
+
+    ```python
+    async with borrow_client_session(session) as client:
+        async with client.get(url) as response:
+            ...
+    ```
+    """
+    if session is not None:
+        yield session
+        return
+    async with aiohttp.ClientSession(timeout = CLIENT_TIMEOUT) as client:
+        yield client
@@ -0,0 +1,240 @@
+"""
+按主机的熔断器。
+
+- 关闭（closed）  ：正常发送请求。连续失败 `BREAKER_FAILURE_THRESHOLD` 次后打开。
+- 打开（open）    ：不发送请求，直接抛出 `CircuitOpenError` 。经过 `BREAKER_COOLDOWN` 秒后进入半开。
+- 半开（half-open）：只放行一个探测请求。成功则关闭，失败则重新打开。
+
+被熔断的工作不会耗尽重试次数，而是被推迟到之后的一轮再处理，见 gather_with_deferral() 。
+
+Usage:
+
+```python
+async with get_breaker("ai.fudan.edu.cn").guard():
+    basic_info = await async_list(url)
+```
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, TypeVar
+
+from config.constants import BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN, BREAKER_MAX_PASSES
+from errors import CircuitOpenError
+from .deadline import remaining
+from .retry import classify, PERMANENT
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class CircuitBreaker():
+    """
+    一个主机的熔断器。
+    """
+
+    def __init__(self, host: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self.state = CLOSED
+        self.failures = 0       # 连续失败次数
+        self.opened_at = 0.0    # 上次打开的时刻（time.monotonic()）
+        self.times_opened = 0
+        self.rejected = 0       # 被直接拒绝的请求数
+        self.deferred = 0       # 被推迟的工作数
+        self.abandoned = 0      # 多轮后仍被熔断或到截止时间仍未完成而被放弃的工作数
+        self._probing = False   # 半开状态下是否已有探测请求在进行
+
+
+    def retry_after(self) -> float:
+        """
+        距离可以发送探测请求还有多少秒。
+        """
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+
+    def _before_call(self) -> bool:
+        """
+        检查是否允许发送请求。
+
+        Return:
+
+        - 本次请求是否为半开状态下的探测请求。
+        """
+        if (self.state == OPEN) and (self.retry_after() == 0):
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return False
+        if (self.state == HALF_OPEN) and (not self._probing):
+            self._probing = True
+            return True
+        self.rejected += 1
+        raise CircuitOpenError(self.host, self.retry_after() or self.cooldown)
+
+
+    def _on_success(self) -> None:
+        if self.state != CLOSED:
+            print(f"{self.host} 的熔断器已关闭。")
+        self.state = CLOSED
+        self.failures = 0
+
+
+    def _on_failure(self) -> None:
+        self.failures += 1
+        if (self.state == HALF_OPEN) or (self.failures >= self.failure_threshold):
+            if self.state != OPEN:
+                print(f"{self.host} 连续失败 {self.failures} 次，熔断 {self.cooldown:.0f} 秒。")
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """
+        异步上下文管理器：熔断时抛出 `CircuitOpenError` ，否则记录请求的结果。
+
+        只有主机可能有问题的错误（网络错误、被限流、无法解析）才计为失败，见 utils.retry.classify() 。
+        """
+        probe = self._before_call()
+        try:
+            yield
+        except Exception as error:
+            if classify(error) != PERMANENT:
+                self._on_failure()
+            elif probe:
+                self._on_success() # 探测请求到达了主机，只是结果不可用
+            raise
+        else:
+            self._on_success()
+        finally:
+            if probe:
+                self._probing = False
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return like:
+
+        ```python
+        {"host": "www.it.fudan.edu.cn", "state": "closed", "times_opened": 1, "rejected": 12, "deferred": 12, "abandoned": 0}
+        ```
+        """
+        return {
+            "host": self.host,
+            "state": self.state,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "deferred": self.deferred,
+            "abandoned": self.abandoned,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    """
+    返回主机 `host` 的熔断器，同一主机在整个进程中共用一个。
+    """
+    if host not in _breakers:
+        _breakers[host] = CircuitBreaker(host)
+    return _breakers[host]
+
+
+def all_stats() -> List[Dict[str, Any]]:
+    """
+    返回所有主机的熔断器的统计信息，见 CircuitBreaker.stats() 。
+    """
+    return [breaker.stats() for breaker in _breakers.values()]
+
+
+# 到截止时间仍未完成、被取消的项的结果
+_EXPIRED = object()
+
+
+async def _run_until_deadline(coroutines: List[Awaitable[R]]) -> List[Any]:
+    """
+    并发运行 `coroutines` ，到当前阶段的截止时间（见 `utils.deadline`）时取消未完成的。
+
+    Return:
+
+    - 每个协程的结果或异常；被取消的为 `_EXPIRED` 。
+    """
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    if not tasks:
+        return []
+    (_, unfinished) = await asyncio.wait(tasks, timeout = remaining())
+    for task in unfinished:
+        task.cancel()
+    if unfinished:
+        await asyncio.wait(unfinished)
+    return [
+        _EXPIRED if task.cancelled() else (task.exception() or task.result())
+        for task in tasks
+    ]
+
+
+async def gather_with_deferral(host: str, func: Callable[[T], Awaitable[R]], items: Iterable[T]) -> List[R]:
+    """
+    并发地对每一项调用 `func(item)` 。因主机 `host` 被熔断而失败的项被推迟，等熔断器可以探测后再处理，最多处理 `BREAKER_MAX_PASSES` 轮。
+
+    若设置了阶段截止时间（见 `utils.deadline.stage_deadline()`），到时取消未完成的项。
+
+    Return:
+
+    - 成功完成的项的结果，按 `items` 的顺序。多轮后仍被熔断的项、到截止时间仍未完成的项被放弃。
+
+    Raise:
+
+    - 除 `CircuitOpenError` 以外的第一个异常。
+    """
+    breaker = get_breaker(host)
+    items = list(items)
+    results: Dict[int, R] = {}
+    pending = list(range(len(items)))
+    expired = 0
+    for pass_idx in range(BREAKER_MAX_PASSES):
+        if pass_idx > 0:
+            delay = breaker.retry_after()
+            if (remaining() is not None) and (remaining() <= delay):
+                break
+            print(f"{host} 被熔断，{len(pending)} 项工作被推迟，{delay:.0f} 秒后进行第 {pass_idx + 1} 轮处理。")
+            await asyncio.sleep(delay)
+            # 半开时只放行一个请求，因此先单独处理一项作为探测，恢复后再并发处理其余各项
+            outcomes = await _run_until_deadline([func(items[pending[0]])])
+            if not isinstance(outcomes[0], CircuitOpenError):
+                outcomes += await _run_until_deadline([func(items[idx]) for idx in pending[1:]])
+            else:
+                outcomes += [outcomes[0]] * (len(pending) - 1)
+        else:
+            outcomes = await _run_until_deadline([func(items[idx]) for idx in pending])
+        deferred: List[int] = []
+        for (idx, outcome) in zip(pending, outcomes):
+            if outcome is _EXPIRED:
+                expired += 1
+            elif isinstance(outcome, CircuitOpenError):
+                deferred.append(idx)
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results[idx] = outcome
+        breaker.deferred += len(deferred)
+        pending = deferred
+        if not pending:
+            break
+    breaker.abandoned += expired + len(pending)
+    if expired:
+        print(f"{host}：已到截止时间，放弃 {expired} 项未完成的工作。")
+    if pending:
+        print(f"{host} 仍被熔断，放弃 {len(pending)} 项工作。")
+    return [results[idx] for idx in sorted(results)]
@@ -0,0 +1,162 @@
+"""
+断点续爬的检查点日志。
+
+日志是一个只追加的 JSON Lines 文件（默认为 `CHECKPOINT_PATH`），每行一条记录：
+
+- `{"kind": "college", "college": "ai", "infos": [...]}` ：已完成的学院及其老师的基本信息。
+- `{"kind": "teachers", "keys": ["计算与智能创新学院/1001", ...], "rows": [[...], ...]}` ：已完成的一组同名老师的键（学院与 `person_id`）及与之一一对应的论文信息。
+
+只有完整完成的工作才会被记录：请求用尽重试次数、被熔断或到截止时间仍未完成的老师不会被记录，续爬时重新处理。
+每条记录写入后立即刷新，程序在任何时刻崩溃都最多丢失正在写入的一行，读取时忽略不完整的行，续爬时新的记录从下一行开始。
+
+Usage:
+
+```python
+with Checkpoint(resume = True) as checkpoint:
+    if checkpoint.has_college("ai"):
+        infos = checkpoint.college_infos("ai")
+```
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+from config.constants import CHECKPOINT_PATH, FILE_ENCODING
+
+
+class Checkpoint():
+    """
+    检查点日志。
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, resume: bool = False):
+        """
+        Params:
+
+        - `path`  : 日志文件的路径。
+        - `resume`: 是否读取已有的日志以续爬。若为 `False` ，则清空已有的日志。
+        """
+        self.path = path
+        self._colleges: Dict[str, List[Dict[str, str]]] = {}
+        self._offsets: Dict[str, int] = {} # 已完成的老师（键）的最后一条记录在日志中的位置（字节）
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+        if resume:
+            for (offset, record) in self._records():
+                if record["kind"] == "college":
+                    self._colleges[record["college"]] = record["infos"]
+                elif record["kind"] == "teachers":
+                    self._offsets.update(dict.fromkeys(record["keys"], offset))
+            print(f"从 {path} 续爬：已完成 {len(self._colleges)} 个学院、{len(self._offsets)} 位老师。")
+        self._file = open(path, mode = "a" if resume else "w", encoding = FILE_ENCODING)
+        if resume and self._file.tell() and (not self._ends_with_newline()):
+            self._file.write("\n") # 使新的记录不接在崩溃时未写完的行后面
+
+
+    def close(self) -> None:
+        self._file.close()
+
+
+    def __enter__(self) -> "Checkpoint":
+        return self
+
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, mode = "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+
+    def _records(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        逐行读出日志，返回每条记录及其起始位置（字节）。
+        """
+        try:
+            file = open(self.path, mode = "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            offset = 0
+            for line in file:
+                try:
+                    yield (offset, json.loads(line))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    pass # 崩溃时未写完的行
+                offset += len(line)
+
+
+    def _append(self, record: Dict[str, Any]) -> int:
+        """
+        追加一条记录，返回其起始位置（字节）。
+        """
+        line = json.dumps(record, ensure_ascii = False)
+        with self._lock:
+            offset = self._file.tell()
+            self._file.write(line)
+            self._file.write("\n")
+            self._file.flush()
+        return offset
+
+
+    def has_college(self, college: str) -> bool:
+        return college in self._colleges
+
+
+    def college_infos(self, college: str) -> List[Dict[str, str]]:
+        """
+        返回已完成的学院 `college` 的老师的基本信息。
+        """
+        return self._colleges[college]
+
+
+    def record_college(self, college: str, infos: List[Dict[str, str]]) -> None:
+        """
+        记录已完成的学院 `college` 及其老师的基本信息。
+        """
+        self._colleges[college] = infos
+        self._append({"kind": "college", "college": college, "infos": infos})
+
+
+    def has_teachers(self, keys: Iterable[str]) -> bool:
+        """
+        这些老师（键）是否都已完成。
+        """
+        return all(key in self._offsets for key in keys)
+
+
+    def record_teachers(self, keys: List[str], rows: List[List[Dict[str, str]]]) -> None:
+        """
+        记录已完成的一组老师及其论文信息。
+
+        Params:
+
+        - `keys`: 老师的键，见 `exlibrisgroup.spider._teacher_key()` 。
+        - `rows`: 与 `keys` 一一对应的论文信息列表。
+        """
+        offset = self._append({"kind": "teachers", "keys": keys, "rows": rows})
+        self._offsets.update(dict.fromkeys(keys, offset))
+
+
+    def iter_rows(self, keys: Set[str]) -> Iterator[Dict[str, str]]:
+        """
+        逐条读出日志中属于 `keys` 的论文信息，不一次性读入内存。
+
+        同一位老师出现在多条记录中时（如同名分组在两次运行之间发生了变化），只采用最后一条。
+        每位老师最后一条记录的位置已在读取日志或写入记录时记下，这里只读取这些行。
+        """
+        self._file.flush()
+        offsets = sorted({self._offsets[key] for key in keys if key in self._offsets})
+        with open(self.path, mode = "rb") as file:
+            for offset in offsets:
+                file.seek(offset)
+                record = json.loads(file.readline())
+                for (key, rows) in zip(record["keys"], record["rows"]):
+                    if (key in keys) and (self._offsets[key] == offset):
+                        yield from rows
@@ -0,0 +1,167 @@
+"""
+截止时间与对冲请求。
+
+- 阶段截止时间：`stage_deadline(seconds)` 为当前协程及其创建的任务设置截止时间。
+  `utils.breaker.gather_with_deferral()` 到时放弃未完成的工作并返回已完成的结果，而不是让整个阶段无限拖长。
+  此时阶段的结果不完整，调用者应据此不覆盖已有的输出，见 `StageDeadline.expired` 。
+- 对冲请求：`hedged(host, func)` 先发出一个请求；若超过该主机最近成功请求延迟的 p95 仍未返回，
+  再发出一个相同的请求，采用先成功返回的那个，取消另一个。只应用于幂等的请求。
+
+单个请求的超时见 `utils.aiohttp.CLIENT_TIMEOUT` 。
+
+Usage:
+
+```python
+with stage_deadline(600) as deadline:
+    teacher_infos = await async_general_information()
+if deadline.expired:
+    ... # 结果不完整
+
+basic_info = await hedged("www.it.fudan.edu.cn", view_once)
+print(hedge_stats())
+```
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, TypeVar
+
+from config.constants import HEDGING, HEDGE_MIN_SAMPLES
+from .limiter import get_limiter
+
+T = TypeVar("T")
+
+# 当前阶段的截止时刻（time.monotonic()），`None` 表示没有截止时间
+_deadline: ContextVar[float | None] = ContextVar("deadline", default = None)
+
+
+class StageDeadline():
+    """
+    stage_deadline() 设置的截止时间。
+    """
+
+    def __init__(self, at: float | None):
+        self.at = at # 截止时刻（time.monotonic()），`None` 表示没有截止时间
+
+
+    @property
+    def expired(self) -> bool:
+        """
+        是否已到截止时间。在 `with` 块结束后读取，即可知道阶段内是否有工作因截止时间而被放弃。
+        """
+        return (self.at is not None) and (time.monotonic() >= self.at)
+
+
+@contextmanager
+def stage_deadline(seconds: float | None) -> Iterator[StageDeadline]:
+    """
+    在 `with` 块内设置 `seconds` 秒后的截止时间。若 `seconds` 为 `None` ，则不设置。已有更早的截止时间时保留更早的。
+    """
+    deadline = _deadline.get()
+    if seconds is not None:
+        deadline = min(filter(None, (deadline, time.monotonic() + seconds)))
+    token = _deadline.set(deadline)
+    try:
+        yield StageDeadline(deadline)
+    finally:
+        _deadline.reset(token)
+
+
+def expired() -> bool:
+    """
+    当前阶段是否已到截止时间。
+    """
+    return StageDeadline(_deadline.get()).expired
+
+
+def remaining() -> float | None:
+    """
+    距离当前阶段的截止时间还有多少秒（不小于 0 ）。若没有截止时间，则返回 `None` 。
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+class HedgeStats():
+    """
+    一个主机的对冲请求统计。
+    """
+
+    def __init__(self, host: str):
+        self.host = host
+        self.calls = 0  # 经过 hedged() 的调用数
+        self.hedges = 0 # 发出对冲请求的次数
+        self.wins = 0   # 对冲请求先成功返回的次数
+
+
+    def to_json(self) -> Dict[str, Any]:
+        """
+        Return like:
+
+        ```python
+        {"host": "www.it.fudan.edu.cn", "calls": 143, "hedges": 9, "wins": 6, "win_ratio": 0.67}
+        ```
+        """
+        return {
+            "host": self.host,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "wins": self.wins,
+            "win_ratio": self.wins / self.hedges if self.hedges else 0.0,
+        }
+
+
+_hedge_stats: Dict[str, HedgeStats] = {}
+
+
+def hedge_stats() -> List[Dict[str, Any]]:
+    """
+    返回所有主机的对冲请求统计，见 HedgeStats.to_json() 。
+    """
+    return [stats.to_json() for stats in _hedge_stats.values()]
+
+
+async def hedged(host: str, func: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+    """
+    调用 `await func(*args, **kwargs)` 。若超过主机 `host` 最近成功请求延迟的 p95 仍未返回，则再调用一次，采用先成功返回的结果。
+
+    `func` 应自行在 `host` 的限制器中占用空位，使对冲请求同样受并发上限约束，其延迟也由限制器统计。
+    `HEDGING` 为 `False` 或样本数不足 `HEDGE_MIN_SAMPLES` 时，不发出对冲请求。
+
+    Raise:
+
+    - 两个请求都失败时，抛出后失败的那个的异常。
+    """
+    stats = _hedge_stats.setdefault(host, HedgeStats(host))
+    stats.calls += 1
+    delay = get_limiter(host).percentile(0.95, HEDGE_MIN_SAMPLES) if HEDGING else None
+    if delay is None:
+        return await func(*args, **kwargs)
+
+    primary = asyncio.ensure_future(func(*args, **kwargs))
+    tasks = {primary}
+    try:
+        (done, _) = await asyncio.wait(tasks, timeout = delay)
+        if done:
+            return primary.result()
+
+        hedge = asyncio.ensure_future(func(*args, **kwargs))
+        tasks.add(hedge)
+        stats.hedges += 1
+        while True:
+            (done, pending) = await asyncio.wait(tasks, return_when = asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        stats.wins += 1
+                    return task.result()
+            if not pending:
+                raise done.pop().exception()
+            tasks = pending # 先完成的失败了，等另一个
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,159 @@
+"""
+流式写入 JSON Lines 文件。
+
+`JsonlWriter` 在专门的线程中把数据逐行写入临时文件 `{path}.tmp` ，每隔 `WRITER_FLUSH_INTERVAL` 秒刷新一次，
+正常关闭时再原子地重命名为 `path` 。因此：
+
+- 内存中只保留尚未写出的数据（不超过 `WRITER_QUEUE_SIZE` 条），与数据总量无关；
+- write() 只是把数据放入队列，写入线程积压时等待；在协程中应使用 async_write() ，积压时在线程池中等待，不阻塞事件循环；
+- 程序中途崩溃时，已刷新的数据保留在临时文件中，`path` 处的旧文件也不会被写坏。
+
+Usage:
+
+```python
+with JsonlWriter(ALL_DATA_FILE_PATH) as writer:
+    writer.write_many(paper_infos)             # 同步代码中
+    await writer.async_write_many(paper_infos) # 协程中
+```
+"""
+
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable
+
+from config.constants import FILE_ENCODING, WRITER_FLUSH_INTERVAL, WRITER_QUEUE_SIZE
+
+
+# 通知写入线程结束的标记
+_CLOSE = object()
+
+
+class JsonlWriter():
+    """
+    在专门的线程中写入 JSON Lines 文件，关闭时原子地提交。
+    """
+
+    def __init__(self, path: str, flush_interval: float = WRITER_FLUSH_INTERVAL, queue_size: int = WRITER_QUEUE_SIZE):
+        """
+        Params:
+
+        - `path`          : 最终的文件路径。写入过程中使用 `{path}.tmp` 。
+        - `flush_interval`: 刷新到磁盘的间隔（秒）。
+        - `queue_size`    : 等待写入的最大条数。写入线程跟不上时，write() 会等待。
+        """
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.flush_interval = flush_interval
+        self.rows = 0 # 已写入的条数
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+        self._file = open(self.temp_path, mode = "w", encoding = FILE_ENCODING)
+        self._queue: queue.Queue[Dict[str, Any] | object] = queue.Queue(maxsize = queue_size)
+        self._error: BaseException | None = None
+        self._closed = False
+        self._thread = threading.Thread(target = self._run, name = "JsonlWriter", daemon = True)
+        self._thread.start()
+
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        # 出错时不提交，已写入的数据保留在临时文件中
+        self.close(commit = exc_type is None)
+
+
+    def write(self, row: Dict[str, Any]) -> None:
+        """
+        写入一条数据。线程安全。
+        """
+        self._check()
+        self._queue.put(row)
+
+
+    def write_many(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """
+        写入多条数据。线程安全。
+        """
+        for row in rows:
+            self.write(row)
+
+
+    async def async_write(self, row: Dict[str, Any]) -> None:
+        """
+        write() 的异步版本。队列未满时立即放入；否则在线程池中等待空位，不阻塞事件循环。
+        """
+        self._check()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self._queue.put, row)
+
+
+    async def async_write_many(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """
+        write_many() 的异步版本。
+        """
+        for row in rows:
+            await self.async_write(row)
+
+
+    def close(self, commit: bool = True) -> None:
+        """
+        等待所有数据写出并关闭文件。若 `commit` 为 `True` ，则把临时文件重命名为 `path` 。
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._check()
+        if commit:
+            os.replace(self.temp_path, self.path)
+
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"写入 {self.temp_path} 时发生错误") from self._error
+
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        while True:
+            try:
+                row = self._queue.get(timeout = self.flush_interval)
+            except queue.Empty:
+                row = None
+            if row is _CLOSE:
+                return
+            try:
+                if row is not None:
+                    self._file.write(json.dumps(row, ensure_ascii = False))
+                    self._file.write("\n")
+                    self.rows += 1
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    self._file.flush()
+                    last_flush = time.monotonic()
+            except BaseException as error:
+                self._error = error
+                self._drain()
+                return
+
+
+    def _drain(self) -> None:
+        # 出错后丢弃剩余的数据，避免 write() 因队列已满而永远等待
+        while True:
+            try:
+                if self._queue.get(timeout = self.flush_interval) is _CLOSE:
+                    return
+            except queue.Empty:
+                if self._closed:
+                    return
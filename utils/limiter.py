@@ -0,0 +1,224 @@
+"""
+按主机自适应地限制并发请求数（AIMD：加性增、乘性减）。
+
+- 请求成功且延迟正常：每完成约 `limit` 个请求（约一轮往返），`limit` 加 1 。
+- 请求出错、超时或被限流：`limit` 乘以 `LIMITER_DECREASE_FACTOR` 。同一轮中的多个错误只减一次。
+- 请求成功但延迟超过基线的 `LIMITER_LATENCY_TOLERANCE` 倍：`limit` 保持不变。
+
+Usage:
+
+```python
+async with get_limiter("ai.fudan.edu.cn").slot():
+    basic_info = await async_list(url)
+
+print(get_limiter("ai.fudan.edu.cn").stats())
+```
+"""
+
+import asyncio
+from collections import deque
+import time
+from typing import Any, Deque, Dict, List, Tuple
+
+import aiohttp
+
+from config.constants import (
+    CONCURRENCY_NUMBER,
+    LIMITER_INITIAL_LIMIT,
+    LIMITER_DECREASE_FACTOR,
+    LIMITER_LATENCY_TOLERANCE,
+)
+from errors import UnauthorizedError
+
+
+# 不反映主机负载的错误，不影响并发上限
+_NEUTRAL_ERRORS: Tuple[type, ...] = (UnauthorizedError,)
+
+# 表示被限流的 HTTP 状态码
+_THROTTLED_STATUS = frozenset({429, 503})
+
+# 计算延迟分位数时使用的最近成功请求数
+_LATENCY_WINDOW = 200
+
+
+def _classify(error: BaseException) -> str | None:
+    """
+    返回错误的种类：`"timeout"` 、 `"throttled"` 、 `"error"` ，或 `None` （不影响并发上限）。
+    """
+    if isinstance(error, _NEUTRAL_ERRORS):
+        return None
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ServerTimeoutError)):
+        return "timeout"
+    if isinstance(error, aiohttp.ClientResponseError) and (error.status in _THROTTLED_STATUS):
+        return "throttled"
+    return "error"
+
+
+class AdaptiveLimiter():
+    """
+    一个主机的自适应并发限制器。
+    """
+
+    def __init__(self, host: str, initial_limit: int = LIMITER_INITIAL_LIMIT, max_limit: int = CONCURRENCY_NUMBER, min_limit: int = 1):
+        self.host = host
+        self.limit = max(min_limit, min(initial_limit, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+
+        self.in_flight = 0
+        self.history: List[Tuple[float, int, str]] = [(time.time(), self.limit, "初始值")] # (时间戳, 新的上限, 原因)
+
+        self._baseline: float | None = None # 延迟的基线（秒），即近期的最小延迟
+        self._latencies: Deque[float] = deque(maxlen = _LATENCY_WINDOW) # 最近成功请求的延迟（秒）
+        self._successes = 0                 # 上次调整以来的健康请求数
+        self._last_decrease = 0.0           # 上次减小上限的时刻（time.monotonic()）
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._condition: asyncio.Condition | None = None
+
+
+    def slot(self) -> "_Slot":
+        """
+        返回一个异步上下文管理器：进入时等待空位，退出时根据是否出错及延迟调整上限。
+        """
+        return _Slot(self)
+
+
+    def _get_condition(self) -> asyncio.Condition:
+        # asyncio.Condition 与事件循环绑定，main.py 中的每次 asyncio.run() 都需要新建；已学到的上限保留
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self.in_flight = 0
+        return self._condition
+
+
+    async def acquire(self) -> float:
+        """
+        等待空位。
+
+        Return:
+
+        - 获得空位的时刻（time.monotonic()），应传给 release() 。
+        """
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return time.monotonic()
+
+
+    async def release(self, started: float, error: BaseException = None, record: bool = True) -> None:
+        """
+        释放空位，并根据请求的结果调整上限。
+
+        Params:
+
+        - `started`: acquire() 的返回值。
+        - `error`  : 请求抛出的异常。若为 `None` ，则表示请求成功。
+        - `record` : 是否根据本次请求调整上限。被取消的请求不反映主机负载，不应调整。
+        """
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            if record and (error is None):
+                self._on_success(time.monotonic() - started)
+            elif record and (_classify(error) is not None):
+                self._on_failure(started, _classify(error))
+            condition.notify_all()
+
+
+    def percentile(self, q: float, min_samples: int = 1) -> float | None:
+        """
+        最近成功请求的延迟（秒）的 `q` 分位数，如 `q = 0.95` 。样本数不足 `min_samples` 时返回 `None` 。
+        """
+        if len(self._latencies) < max(1, min_samples):
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+    def _on_success(self, latency: float) -> None:
+        self._latencies.append(latency)
+        # 基线缓慢上浮，使过时的最小值可以被新的测量替换
+        self._baseline = latency if self._baseline is None else min(latency, self._baseline * 1.05)
+        if latency > LIMITER_LATENCY_TOLERANCE * self._baseline:
+            return
+        self._successes += 1
+        if (self._successes >= self.limit) and (self.limit < self.max_limit):
+            self._change(self.limit + 1, f"延迟正常（{latency * 1000:.0f} ms）")
+
+
+    def _on_failure(self, started: float, kind: str) -> None:
+        if started < self._last_decrease:
+            return # 该请求在上次减小之前就已发出，同一轮的错误只减一次
+        self._last_decrease = time.monotonic()
+        new_limit = max(self.min_limit, int(self.limit * LIMITER_DECREASE_FACTOR))
+        self._change(new_limit, kind)
+        print(f"{self.host} 的并发上限因 {kind} 降为 {new_limit} 。")
+
+
+    def _change(self, new_limit: int, reason: str) -> None:
+        self._successes = 0
+        if new_limit != self.limit:
+            self.limit = new_limit
+            self.history.append((time.time(), new_limit, reason))
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return like:
+
+        ```python
+        {
+            "host": "ai.fudan.edu.cn",
+            "limit": 12,
+            "in_flight": 3,
+            "baseline_latency_ms": 85.0,
+            "p95_latency_ms": 240.0,
+            "history": [(1760000000.0, 4, "初始值"), (1760000001.2, 5, "延迟正常（90 ms）"), ...],
+        }
+        ```
+        """
+        return {
+            "host": self.host,
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "baseline_latency_ms": 1000 * self._baseline if self._baseline is not None else None,
+            "p95_latency_ms": 1000 * p95 if (p95 := self.percentile(0.95)) is not None else None,
+            "history": list(self.history),
+        }
+
+
+class _Slot():
+    def __init__(self, limiter: AdaptiveLimiter):
+        self.limiter = limiter
+        self.started = 0.0
+
+
+    async def __aenter__(self) -> "_Slot":
+        self.started = await self.limiter.acquire()
+        return self
+
+
+    async def __aexit__(self, exc_type, exc, traceback) -> None:
+        await self.limiter.release(self.started, exc, record = not isinstance(exc, asyncio.CancelledError))
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+
+
+def get_limiter(host: str) -> AdaptiveLimiter:
+    """
+    返回主机 `host` 的自适应并发限制器，同一主机在整个进程中共用一个。
+    """
+    if host not in _limiters:
+        _limiters[host] = AdaptiveLimiter(host)
+    return _limiters[host]
+
+
+def all_stats() -> List[Dict[str, Any]]:
+    """
+    返回所有主机的限制器的统计信息，见 AdaptiveLimiter.stats() 。
+    """
+    return [limiter.stats() for limiter in _limiters.values()]
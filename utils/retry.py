@@ -0,0 +1,195 @@
+"""
+请求失败时的重试策略。
+
+错误被分为四类：
+
+- `TRANSIENT`：网络的暂时性错误，如连接被重置、超时、5xx 。
+- `THROTTLED`：被限流，如 429/503 。退避时间更长。
+- `PARSE`    ：响应无法解析，多为被反爬机制拦截后返回的页面。
+- `PERMANENT`：重试也无济于事的错误，如 4xx 、程序错误。不重试。
+
+可重试的错误按“指数退避 + 完全抖动”等待：第 n 次重试前等待 `uniform(0, min(RETRY_MAX_DELAY, base * 2 ** (n - 1)))` 秒。
+第一次请求之前不等待。
+
+每个主机有各自的重试预算（与限制器、熔断器一样按主机区分）：每次调用存入 `RETRY_BUDGET_RATIO` 个令牌，每次重试取出一个。
+预算耗尽时不再重试，因此某个主机宕机时，重试带来的额外请求不超过发往它的正常请求的 `RETRY_BUDGET_RATIO` 倍，
+也不会耗尽其他主机的预算。
+
+Usage:
+
+```python
+pnx_infos = await default_policy.call(async_pnxs, jwt_token, "阚海斌", 10, "fdu", host = "fudan.primo.exlibrisgroup.com.cn", description = "查询阚海斌老师的论文")
+```
+"""
+
+import asyncio
+import json
+import random
+from typing import Any, Awaitable, Callable, Dict, List, TypeVar
+
+import aiohttp
+
+from config.constants import (
+    RETRANSMISSION,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_BUDGET_RATIO,
+    RETRY_BUDGET_RESERVE,
+)
+from errors import CircuitOpenError, DataParseError, UnauthorizedError
+
+
+TRANSIENT = "transient"
+THROTTLED = "throttled"
+PARSE = "parse"
+PERMANENT = "permanent"
+
+# 各类错误的退避时间相对于 RETRY_BASE_DELAY 的倍数
+_DELAY_MULTIPLIERS: Dict[str, float] = {
+    TRANSIENT: 1,
+    THROTTLED: 4,
+    PARSE: 2,
+}
+
+T = TypeVar("T")
+
+
+def classify(error: BaseException) -> str:
+    """
+    返回错误的种类：`TRANSIENT` 、 `THROTTLED` 、 `PARSE` 或 `PERMANENT` 。
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        if error.status in (429, 503):
+            return THROTTLED
+        if (error.status >= 500) or (error.status == 408):
+            return TRANSIENT
+        return PERMANENT
+    if isinstance(error, UnauthorizedError):
+        return PERMANENT # 已由 TokenManager 刷新并重发过一次
+    if isinstance(error, CircuitOpenError):
+        return PERMANENT # 主机已被熔断，立即失败，由 utils.breaker.gather_with_deferral() 推迟处理
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError, ConnectionError, OSError)):
+        return TRANSIENT
+    # 被反爬拦截时，返回的页面缺少预期的标签（bs4 返回 None 后取属性）或不是合法的 JSON
+    if isinstance(error, (DataParseError, AttributeError, json.JSONDecodeError)):
+        return PARSE
+    return PERMANENT
+
+
+class RetryBudget():
+    """
+    一个主机的重试预算（令牌桶）。初始有 `reserve` 个令牌，每次调用存入 `ratio` 个，每次重试取出一个。
+    """
+
+    def __init__(self, host: str = "", ratio: float = RETRY_BUDGET_RATIO, reserve: int = RETRY_BUDGET_RESERVE):
+        self.host = host
+        self.ratio = ratio
+        self.tokens = float(reserve)
+        self.calls = 0
+        self.retries = 0
+        self.exhausted = 0 # 因预算耗尽而放弃的次数
+
+
+    def deposit(self) -> None:
+        self.calls += 1
+        self.tokens += self.ratio
+
+
+    def withdraw(self) -> bool:
+        """
+        取出一个令牌。若预算已耗尽，则返回 `False` 。
+        """
+        if self.tokens < 1:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1
+        self.retries += 1
+        return True
+
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "host": self.host,
+            "calls": self.calls,
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+            "tokens": self.tokens,
+        }
+
+
+class RetryPolicy():
+    """
+    重试策略。
+    """
+
+    def __init__(self, max_attempts: int = RETRANSMISSION, base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY, budget: RetryBudget = None):
+        """
+        Params:
+
+        - `max_attempts`: 最多的请求次数（含第一次）。
+        - `base_delay`  : 退避时间的基数（秒）。
+        - `max_delay`   : 单次退避时间的上限（秒）。
+        - `budget`      : 重试预算。默认使用各主机各自的预算，见 get_retry_budget() 。
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+
+    def delay(self, kind: str, attempt: int) -> float:
+        """
+        第 `attempt` 次失败后、下一次重试前的等待时间（秒），带完全抖动。
+        """
+        cap = min(self.max_delay, self.base_delay * _DELAY_MULTIPLIERS[kind] * 2 ** (attempt - 1))
+        return random.uniform(0, cap)
+
+
+    async def call(self, func: Callable[..., Awaitable[T]], *args: Any, host: str = "", description: str = "", **kwargs: Any) -> T:
+        """
+        调用 `await func(*args, **kwargs)` ，失败时按策略重试。
+
+        Params:
+
+        - `host`       : 请求的主机，重试时从它的预算中取出令牌。
+        - `description`: 打印错误信息时使用的描述，如 `"解析阚海斌老师的论文数据"` 。
+
+        Raise:
+
+        - 最后一次失败的异常：错误不可重试、达到最大请求次数或重试预算耗尽时。
+        """
+        budget = self.budget or get_retry_budget(host)
+        budget.deposit()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await func(*args, **kwargs)
+            except Exception as error:
+                kind = classify(error)
+                if (kind == PERMANENT) or (attempt == self.max_attempts) or (not budget.withdraw()):
+                    raise
+                delay = self.delay(kind, attempt)
+                print(f"{description}时发生第 {attempt} 次错误（{kind}），{delay:.1f} 秒后重试: {str(error)[:50]}")
+                await asyncio.sleep(delay)
+
+
+_budgets: Dict[str, RetryBudget] = {}
+
+
+def get_retry_budget(host: str) -> RetryBudget:
+    """
+    返回主机 `host` 的重试预算，同一主机在整个进程中共用一个。
+    """
+    if host not in _budgets:
+        _budgets[host] = RetryBudget(host)
+    return _budgets[host]
+
+
+def all_stats() -> List[Dict[str, Any]]:
+    """
+    返回所有主机的重试预算的统计信息，见 RetryBudget.to_json() 。
+    """
+    return [budget.to_json() for budget in _budgets.values()]
+
+
+# 默认的重试策略
+default_policy = RetryPolicy()